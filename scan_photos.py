@@ -4,21 +4,356 @@ Ce module permet de scanner un répertoire de photos et de stocker
 les informations de chaque fichier (répertoire, nom, hauteur, largeur).
 """
 
+import csv
 import json
+import re
 import sqlite3
+import struct
+import threading
+import time
+from collections import deque
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ThreadPoolExecutor,
+    wait,
+)
+from contextlib import nullcontext
 from datetime import datetime
+from functools import partial
+from itertools import chain, islice
 from pathlib import Path
-from typing import List, Dict, Optional, Tuple
+from types import TracebackType
+from queue import Empty, Queue
+from typing import (
+    BinaryIO, Deque, Generator, Iterable, Iterator, List, Dict, Optional,
+    Tuple, TypeVar, cast
+)
 import os
-import pandas as pd
-from PIL import Image
+import sys
+from PIL import Image, UnidentifiedImageError
 from tqdm import tqdm
 from dotenv import load_dotenv
 
 
-def get_image_dimensions(image_path: Path) -> Optional[Tuple[int, int]]:
+# Seules les dimensions sont lues, jamais les pixels : le contrôle anti
+# « decompression bomb » n'a pas d'objet et rejetterait les grands
+# panoramas. Les plugins PIL courants sont chargés une fois à l'import.
+Image.MAX_IMAGE_PIXELS = None
+Image.preinit()
+
+
+# Extensions des fichiers images pris en compte par le scan
+IMAGE_EXTENSIONS = frozenset({
+    '.jpg', '.jpeg', '.png', '.gif', '.bmp',
+    '.tiff', '.tif', '.webp', '.raw', '.cr2',
+    '.nef', '.orf', '.sr2', '.arw', '.dng'
+})
+# Même liste sous forme de tuple, pour un seul appel à str.endswith
+IMAGE_SUFFIXES = tuple(sorted(IMAGE_EXTENSIONS))
+
+# Taille du tampon d'écriture des fichiers de résultats (1 Mio)
+_WRITE_BUFFER_SIZE = 1024 * 1024
+
+# Photos par lot d'insertion SQLite, et délai maximal entre deux lots pour
+# que la base reflète l'avancement même quand le scan ralentit
+_DEFAULT_BATCH_SIZE = 10000
+_FLUSH_INTERVAL_SECONDS = 2.0
+
+# Réglages de la base du scan : elle est recréée à chaque exécution, une
+# synchronisation complète à chaque commit n'apporte donc rien
+_SQLITE_WRITE_PRAGMAS = (
+    # Sans effet sur une base existante : doit précéder la création de table
+    'page_size=8192',
+    'journal_mode=WAL',
+    'synchronous=NORMAL',
+    'temp_store=MEMORY',
+    'cache_size=-65536',
+)
+
+# À partir de ce nombre de fichiers, les dimensions sont lues par plusieurs
+# threads : sur un partage réseau, les lectures se recouvrent (PIL libère le
+# GIL pendant les I/O). En dessous, la création du pool coûte plus cher.
+_PARALLEL_SCAN_THRESHOLD = 256
+_MAX_SCAN_WORKERS = 64
+# Nombre maximal de fichiers soumis au pool et pas encore rendus
+_SCAN_WINDOW_SIZE = 1024
+# Nombre maximal de chemins découverts en attente de traitement
+_DISCOVERY_QUEUE_SIZE = 10000
+# Répertoires listés en parallèle : chaque scandir attend un aller-retour
+# réseau sur un partage SMB. Tant qu'au plus _PARALLEL_WALK_MIN_PENDING
+# répertoires restent à lister, le parcours reste séquentiel (arbres peu
+# ramifiés, pour lesquels les threads coûteraient plus qu'ils n'apportent).
+_DISCOVERY_WORKERS = 8
+_PARALLEL_WALK_MIN_PENDING = 4
+# Nombre de fichiers en échec listés à la fin du scan
+_FAILED_FILES_SHOWN = 10
+
+_T = TypeVar('_T')
+
+
+# Formats dont les dimensions sont lues directement dans l'en-tête, sans
+# passer par PIL. Les RAW CR2, NEF, SR2, ARW et DNG ont une structure TIFF :
+# leur premier IFD donne la même taille que celle rapportée par PIL. Les ORF
+# sont aussi des TIFF, mais avec leur propre signature, que PIL ne reconnaît
+# pas : seul l'en-tête permet d'en obtenir les dimensions.
+_HEADER_PARSED_EXTENSIONS = frozenset({
+    '.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp',
+    '.tif', '.tiff', '.cr2', '.nef', '.orf', '.sr2', '.arw', '.dng'
+})
+_HEADER_READ_SIZE = 64
+_TIFF_SIGNATURES = {
+    b'II*\x00': '<', b'MM\x00*': '>',
+    # Olympus ORF
+    b'IIRO': '<', b'IIRS': '<', b'MMOR': '>',
+}
+# Tags TIFF ImageWidth et ImageLength, et types SHORT et LONG
+_TIFF_WIDTH_TAG = 256
+_TIFF_HEIGHT_TAG = 257
+_TIFF_VALUE_FORMATS = {3: 'H', 4: 'I'}
+# Taille en octets d'une valeur selon son type TIFF (BYTE à DOUBLE)
+_TIFF_TYPE_SIZES = {
+    1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 6: 1, 7: 1, 8: 2, 9: 4, 10: 8, 11: 4, 12: 8
+}
+# Marqueurs JPEG SOFn portant les dimensions (hors DHT, JPG et DAC)
+_JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+_JPEG_SOS_MARKER = 0xDA
+_PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+def _read_jpeg_dimensions(f: BinaryIO) -> Optional[Tuple[int, int]]:
+    """Parcourt les segments JPEG jusqu'au marqueur SOS.
+
+    Comme PIL, les dimensions du SOF ne sont retenues que si l'en-tête est
+    complet, jusqu'au segment SOS inclus : un fichier tronqué avant est
+    laissé à PIL, qui le rejette.
+
+    Args:
+        f: Fichier ouvert en binaire, positionné après le marqueur SOI.
+
+    Returns:
+        Tuple (largeur, hauteur) ou None si l'en-tête est incomplet ou
+        sans SOF.
+
+    """
+    dimensions = None
+    while True:
+        byte = f.read(1)
+        if not byte:
+            return None
+        if byte != b'\xff':
+            continue
+        marker = f.read(1)
+        # Octets de remplissage 0xFF entre deux segments
+        while marker == b'\xff':
+            marker = f.read(1)
+        if not marker:
+            return None
+        code = marker[0]
+        # Marqueurs sans segment (RSTn, TEM)
+        if 0xD0 <= code <= 0xD7 or code == 0x01:
+            continue
+        segment = f.read(2)
+        if len(segment) < 2:
+            return None
+        length = struct.unpack('>H', segment)[0]
+        data = f.read(length - 2)
+        if len(data) < length - 2:
+            return None
+        if code in _JPEG_SOF_MARKERS and dimensions is None:
+            height, width = struct.unpack_from('>xHH', data)
+            dimensions = (width, height)
+        elif code == _JPEG_SOS_MARKER:
+            return dimensions
+
+
+def _read_tiff_dimensions(
+    f: BinaryIO, head: bytes, size: int
+) -> Optional[Tuple[int, int]]:
+    """Lit les tags ImageWidth et ImageLength du premier IFD TIFF.
+
+    Comme PIL, l'IFD doit être complet, valeurs hors entrée comprises.
+
+    Args:
+        f: Fichier TIFF ouvert en binaire.
+        head: Premiers octets du fichier (en-tête TIFF).
+        size: Taille du fichier en octets.
+
+    Returns:
+        Tuple (largeur, hauteur) ou None si les tags sont absents ou l'IFD
+        tronqué.
+
+    """
+    order = _TIFF_SIGNATURES[head[:4]]
+    ifd_offset = struct.unpack(order + 'I', head[4:8])[0]
+    f.seek(ifd_offset)
+    (count,) = struct.unpack(order + 'H', f.read(2))
+    # Entrées suivies de l'offset de l'IFD suivant
+    if ifd_offset + 2 + 12 * count + 4 > size:
+        return None
+    entries = f.read(12 * count)
+
+    dimensions: Dict[int, int] = {}
+    for offset in range(0, len(entries), 12):
+        tag, value_type, value_count, value_offset = struct.unpack_from(
+            order + 'HHII', entries, offset
+        )
+        value_size = _TIFF_TYPE_SIZES.get(value_type, 0) * value_count
+        if value_size > 4 and value_offset + value_size > size:
+            return None
+        value_format = _TIFF_VALUE_FORMATS.get(value_type)
+        if tag in (_TIFF_WIDTH_TAG, _TIFF_HEIGHT_TAG) and value_format:
+            dimensions[tag] = struct.unpack_from(
+                order + value_format, entries, offset + 8
+            )[0]
+
+    width = dimensions.get(_TIFF_WIDTH_TAG)
+    height = dimensions.get(_TIFF_HEIGHT_TAG)
+    if not width or not height:
+        return None
+    return (width, height)
+
+
+def _read_png_dimensions(
+    f: BinaryIO, head: bytes
+) -> Optional[Tuple[int, int]]:
+    """Lit les dimensions du chunk IHDR d'un PNG.
+
+    Comme PIL, les chunks sont parcourus jusqu'au premier IDAT : un fichier
+    tronqué avant est laissé à PIL, qui le rejette.
+
+    Args:
+        f: Fichier PNG ouvert en binaire.
+        head: Premiers octets du fichier (signature et chunk IHDR).
+
+    Returns:
+        Tuple (largeur, hauteur) ou None si aucun IDAT n'est atteint.
+
+    """
+    width, height = struct.unpack('>II', head[16:24])
+    f.seek(len(_PNG_SIGNATURE))
+    while True:
+        chunk = f.read(8)
+        if len(chunk) < 8:
+            return None
+        length, chunk_type = struct.unpack('>I4s', chunk)
+        if chunk_type == b'IDAT':
+            return (width, height)
+        # Données du chunk et CRC
+        f.seek(length + 4, os.SEEK_CUR)
+
+
+def _read_gif_dimensions(
+    f: BinaryIO, head: bytes
+) -> Optional[Tuple[int, int]]:
+    """Lit la taille de l'écran logique d'un GIF.
+
+    Comme PIL, les blocs sont parcourus jusqu'au descripteur de la première
+    image : un fichier tronqué avant est laissé à PIL, qui le rejette.
+
+    Args:
+        f: Fichier GIF ouvert en binaire.
+        head: Premiers octets du fichier (descripteur d'écran logique).
+
+    Returns:
+        Tuple (largeur, hauteur) ou None si aucune image n'est atteinte.
+
+    """
+    width, height, flags = struct.unpack('<HHB', head[6:11])
+    position = 13
+    # Palette globale
+    if flags & 0x80:
+        position += 3 << ((flags & 0x07) + 1)
+    f.seek(position)
+    while True:
+        block = f.read(1)
+        if block == b',':
+            # Descripteur d'image et taille de code LZW
+            if len(f.read(10)) < 10:
+                return None
+            return (width, height)
+        if block != b'!':
+            return None
+        # Extension : étiquette puis sous-blocs jusqu'au bloc vide
+        if not f.read(1):
+            return None
+        while True:
+            sub_block = f.read(1)
+            if not sub_block:
+                return None
+            if not sub_block[0]:
+                break
+            f.seek(sub_block[0], os.SEEK_CUR)
+
+
+def _read_header_dimensions(image_path: str | Path) -> Optional[Tuple[int, int]]:
+    """Lit les dimensions d'une image dans son en-tête, sans passer par PIL.
+
+    L'en-tête n'est retenu que si le fichier contient tout ce que PIL lit
+    pour l'ouvrir : un fichier tronqué est laissé à PIL, qui le rejette.
+
+    Args:
+        image_path: Chemin vers le fichier image.
+
+    Returns:
+        Tuple (largeur, hauteur) ou None si l'en-tête n'est pas reconnu ou
+        incomplet.
+
+    """
+    with open(image_path, 'rb') as f:
+        head = f.read(_HEADER_READ_SIZE)
+        size = os.fstat(f.fileno()).st_size
+
+        if head[:2] == b'\xff\xd8':
+            f.seek(2)
+            return _read_jpeg_dimensions(f)
+
+        if head[:4] in _TIFF_SIGNATURES:
+            return _read_tiff_dimensions(f, head, size)
+
+        if head[:8] == _PNG_SIGNATURE and head[12:16] == b'IHDR':
+            return _read_png_dimensions(f, head)
+
+        if head[:6] in (b'GIF87a', b'GIF89a'):
+            return _read_gif_dimensions(f, head)
+
+    # En-tête BMP complet (fichier puis DIB)
+    if head[:2] == b'BM' and len(head) >= 26:
+        if size < 14 + struct.unpack('<I', head[14:18])[0]:
+            return None
+        if struct.unpack('<I', head[14:18])[0] == 12:
+            width, height = struct.unpack('<HH', head[18:22])
+        else:
+            width, height = struct.unpack('<ii', head[18:26])
+        return (width, abs(height))
+
+    # PIL décode le WebP d'un bloc : le conteneur RIFF doit être complet
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP' and len(head) >= 30:
+        if size < 8 + struct.unpack('<I', head[4:8])[0]:
+            return None
+        chunk = head[12:16]
+        if chunk == b'VP8 ' and head[23:26] == b'\x9d\x01\x2a':
+            width, height = struct.unpack('<HH', head[26:30])
+            return (width & 0x3FFF, height & 0x3FFF)
+        if chunk == b'VP8L' and head[20] == 0x2F:
+            bits = struct.unpack('<I', head[21:25])[0]
+            return ((bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1)
+        if chunk == b'VP8X':
+            width = int.from_bytes(head[24:27], 'little') + 1
+            height = int.from_bytes(head[27:30], 'little') + 1
+            return (width, height)
+
+    return None
+
+
+def get_image_dimensions(
+    image_path: str | Path
+) -> Optional[Tuple[int, int]]:
     """Récupère les dimensions (largeur, hauteur) d'une image.
 
+    Les formats courants sont lus directement dans l'en-tête ; PIL n'est
+    utilisé que pour les autres formats ou si l'en-tête n'est pas reconnu.
+
     Args:
         image_path: Chemin vers le fichier image.
 
@@ -26,33 +361,140 @@ def get_image_dimensions(image_path: Path) -> Optional[Tuple[int, int]]:
         Tuple contenant (largeur, hauteur) ou None si erreur.
 
     """
+    if os.path.splitext(image_path)[1].lower() in _HEADER_PARSED_EXTENSIONS:
+        try:
+            dimensions = _read_header_dimensions(image_path)
+        except OSError:
+            # Fichier absent ou illisible : PIL échouerait de même, inutile
+            # de refaire un open (un aller-retour réseau de plus)
+            return None
+        except struct.error:
+            dimensions = None
+        if dimensions is not None:
+            return dimensions
+
+    # Erreurs levées par PIL sur un fichier illisible ou un en-tête corrompu
+    # (selon les plugins)
     try:
         with Image.open(image_path) as img:
             width, height = img.size
             return (width, height)
-    except (OSError, IOError, Exception):
+    except (
+        UnidentifiedImageError, OSError, SyntaxError, ValueError,
+        EOFError, struct.error
+    ):
         return None
+    except Exception as error:
+        # Plugin en échec sur des métadonnées malformées (KeyError,
+        # IndexError...) : signalé et compté comme un fichier en échec,
+        # sans interrompre le scan
+        tqdm.write(
+            f"Erreur inattendue sur {image_path}: {error!r}",
+            file=sys.stderr
+        )
+        return None
+
 
+def _has_image_suffix(name: str) -> bool:
+    """Vérifie si un nom de fichier porte une extension d'image.
+
+    Comme pour Path.suffix, un fichier caché nommé seulement « .jpg » n'a
+    pas d'extension.
+
+    Args:
+        name: Nom du fichier, sans répertoire.
+
+    Returns:
+        True si le nom se termine par une extension d'image, False sinon.
 
-def is_image_file(file_path: Path) -> bool:
+    """
+    return name.lower().endswith(IMAGE_SUFFIXES) and name.rfind('.') > 0
+
+
+def is_image_file(file_path: str | Path) -> bool:
     """Vérifie si un fichier est une image supportée.
 
     Args:
-        file_path: Chemin vers le fichier à vérifier.
+        file_path: Chemin (ou simple nom) du fichier à vérifier.
 
     Returns:
         True si le fichier est une image, False sinon.
 
     """
-    image_extensions = {
-        '.jpg', '.jpeg', '.png', '.gif', '.bmp',
-        '.tiff', '.tif', '.webp', '.raw', '.cr2',
-        '.nef', '.orf', '.sr2', '.arw', '.dng'
-    }
-    return file_path.suffix.lower() in image_extensions
+    return _has_image_suffix(os.path.basename(file_path))
+
+
+def _list_directory(directory: str) -> Tuple[List[str], List[str]]:
+    """Parcourt un seul répertoire : sous-répertoires et fichiers images.
+
+    Args:
+        directory: Chemin du répertoire à lister.
+
+    Returns:
+        Tuple (sous-répertoires, fichiers images), vide si le répertoire
+        est illisible (droits, partage déconnecté).
 
+    """
+    subdirectories: List[str] = []
+    image_files: List[str] = []
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                # Comme os.walk : pas de descente dans les liens
+                if entry.is_dir(follow_symlinks=False):
+                    subdirectories.append(entry.path)
+                # is_file suit les liens : un lien vers un répertoire nommé
+                # album.jpg n'est pas une image
+                elif entry.is_file() and _has_image_suffix(entry.name):
+                    image_files.append(entry.path)
+    except OSError:
+        pass
+    return subdirectories, image_files
+
+
+def iter_image_files(directory_path: str | Path) -> Iterator[str]:
+    """Parcourt un répertoire et rend les fichiers images au fil de l'eau.
+
+    Le parcours utilise os.scandir : le nom de chaque entrée et son type
+    sont déjà connus, sans construire de Path ni refaire de stat. Dès que
+    l'arbre se ramifie, les répertoires sont listés par plusieurs threads ;
+    l'ordre des fichiers entre répertoires n'est donc pas garanti.
+
+    Args:
+        directory_path: Chemin du répertoire à scanner.
 
-def scan_directory(directory_path: Path) -> List[Path]:
+    Returns:
+        Itérateur des chemins vers les fichiers images trouvés.
+
+    """
+    if not os.path.isdir(directory_path):
+        return
+
+    pending = [os.fspath(directory_path)]
+    while pending and len(pending) <= _PARALLEL_WALK_MIN_PENDING:
+        subdirectories, image_files = _list_directory(pending.pop())
+        pending.extend(subdirectories)
+        yield from image_files
+    if not pending:
+        return
+
+    with ThreadPoolExecutor(max_workers=_DISCOVERY_WORKERS) as executor:
+        running = {
+            executor.submit(_list_directory, directory)
+            for directory in pending
+        }
+        while running:
+            done, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                subdirectories, image_files = future.result()
+                running.update(
+                    executor.submit(_list_directory, subdirectory)
+                    for subdirectory in subdirectories
+                )
+                yield from image_files
+
+
+def scan_directory(directory_path: str | Path) -> List[str]:
     """Scanne un répertoire et retourne la liste des fichiers images.
 
     Args:
@@ -62,22 +504,65 @@ def scan_directory(directory_path: Path) -> List[Path]:
         Liste des chemins vers les fichiers images trouvés.
 
     """
-    image_files: List[Path] = []
-    if not directory_path.exists():
-        return image_files
+    return list(iter_image_files(directory_path))
+
 
-    for root, dirs, files in os.walk(directory_path):
-        for file in files:
-            file_path = Path(root) / file
-            if is_image_file(file_path):
-                image_files.append(file_path)
+def _iter_in_background(
+    items: Iterable[_T],
+    maxsize: int
+) -> Generator[_T, None, None]:
+    """Produit les éléments d'un itérable dans un thread séparé.
 
-    return image_files
+    Le producteur avance pendant que l'appelant traite les éléments
+    précédents ; la file bornée limite l'avance prise.
+
+    Args:
+        items: Itérable à consommer (par exemple le parcours du disque).
+        maxsize: Nombre maximal d'éléments produits en attente.
+
+    Returns:
+        Itérateur des éléments, dans l'ordre de production.
+
+    """
+    queue: Queue[object] = Queue(maxsize=maxsize)
+    done = object()
+    stop = threading.Event()
+    errors: List[BaseException] = []
+
+    def produce() -> None:
+        try:
+            for item in items:
+                if stop.is_set():
+                    return
+                queue.put(item)
+        except BaseException as error:
+            errors.append(error)
+        finally:
+            queue.put(done)
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = queue.get()
+            if item is done:
+                break
+            yield cast(_T, item)
+    finally:
+        # Arrêt anticipé : débloquer le producteur s'il attend de la place
+        stop.set()
+        while producer.is_alive():
+            try:
+                queue.get(timeout=0.1)
+            except Empty:
+                pass
+    if errors:
+        raise errors[0]
 
 
 def process_image_file(
-    file_path: Path,
-    base_directory: Path
+    file_path: str | Path,
+    base_directory: str | Path
 ) -> Optional[Dict[str, str | int]]:
     """Traite un fichier image et retourne ses informations.
 
@@ -94,22 +579,73 @@ def process_image_file(
         return None
 
     width, height = dimensions
-    relative_path = file_path.relative_to(base_directory)
-    directory = str(relative_path.parent)
-    filename = file_path.name
+    # Les chemins du parcours commencent tous par le répertoire de base : un
+    # découpage de chaîne suffit, os.path.relpath ne sert qu'en repli
+    file_str = os.fspath(file_path)
+    prefix = os.fspath(base_directory).rstrip(os.sep) + os.sep
+    if file_str.startswith(prefix):
+        relative_path = file_str[len(prefix):]
+    else:
+        relative_path = os.path.relpath(file_str, base_directory)
+    directory, _, filename = relative_path.rpartition(os.sep)
 
+    # Les photos d'un même dossier partagent une seule chaîne répertoire
     return {
-        'repertoire': directory,
+        'repertoire': sys.intern(directory or '.'),
         'nom_fichier': filename,
         'hauteur': height,
         'largeur': width
     }
 
 
+def _iter_image_infos(
+    image_files: Iterable[str],
+    base_path: str
+) -> Iterator[Tuple[str, Optional[Dict[str, str | int]]]]:
+    """Traite les fichiers images, en parallèle s'ils sont nombreux.
+
+    Au plus _SCAN_WINDOW_SIZE fichiers sont en cours à la fois, ce qui
+    permet de consommer les fichiers au fur et à mesure de leur découverte.
+
+    Args:
+        image_files: Fichiers images à traiter (liste ou itérateur).
+        base_path: Répertoire de base pour le chemin relatif.
+
+    Returns:
+        Itérateur des couples (chemin, informations ou None si erreur),
+        dans le même ordre que image_files.
+
+    """
+    files = iter(image_files)
+    head = list(islice(files, _PARALLEL_SCAN_THRESHOLD))
+    if len(head) < _PARALLEL_SCAN_THRESHOLD:
+        for file_path in head:
+            yield file_path, process_image_file(file_path, base_path)
+        return
+
+    workers = min(_MAX_SCAN_WORKERS, (os.cpu_count() or 1) * 4)
+    process = partial(process_image_file, base_directory=base_path)
+    window: Deque[Tuple[str, Future[Optional[Dict[str, str | int]]]]] = (
+        deque()
+    )
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for file_path in chain(head, files):
+            window.append((file_path, executor.submit(process, file_path)))
+            if len(window) >= _SCAN_WINDOW_SIZE:
+                done_path, future = window.popleft()
+                yield done_path, future.result()
+
+        # Résultats rendus dans l'ordre de image_files
+        while window:
+            done_path, future = window.popleft()
+            yield done_path, future.result()
+
+
 def scan_photos_directory(
     photos_directory: str | Path,
     sqlite_path: Path | None = None,
-    batch_size: int = 1000
+    batch_size: int = _DEFAULT_BATCH_SIZE
 ) -> List[Dict[str, str | int]]:
     """Scanne un répertoire de photos et retourne les informations.
 
@@ -119,7 +655,8 @@ def scan_photos_directory(
         batch_size: Nombre de photos à traiter avant sauvegarde SQLite.
 
     Returns:
-        Liste de dictionnaires contenant les informations de chaque photo.
+        Liste de dictionnaires contenant les informations de chaque photo,
+        vide si sqlite_path est fourni (tout est alors dans la base).
 
     """
     base_path = Path(photos_directory)
@@ -129,69 +666,119 @@ def scan_photos_directory(
         )
 
     print(f"Scan du répertoire: {base_path}")
-    image_files = scan_directory(base_path)
-    print(f"Nombre de fichiers images trouvés: {len(image_files)}")
+    # Le parcours du disque se poursuit pendant le traitement des premières
+    # images : le nombre total n'est donc connu qu'à la fin
+    image_files = _iter_in_background(
+        iter_image_files(base_path), _DISCOVERY_QUEUE_SIZE
+    )
 
     results: List[Dict[str, str | int]] = []
-    failed_files: List[Path] = []
-    total_saved = 0
-
-    for file_path in tqdm(image_files, desc="Traitement des images"):
-        file_info = process_image_file(file_path, base_path)
-        if file_info is not None:
-            results.append(file_info)
-
-            if sqlite_path and len(results) >= batch_size:
-                save_results_sqlite(results, sqlite_path, append=True)
-                total_saved += len(results)
-                print(f"\n✓ {len(results)} photos sauvegardées dans la BDD (total: {total_saved})")
-                results = []
-        else:
-            failed_files.append(file_path)
-
-    if failed_files:
-        print(f"\n{len(failed_files)} fichiers n'ont pas pu être traités:")
-        for failed_file in failed_files[:10]:
+    # Seuls les premiers échecs sont conservés pour l'affichage : sur une
+    # collection très abîmée, la liste complète grossirait sans limite
+    failed_files: List[str] = []
+    failed_count = 0
+
+    # Barre redessinée au plus deux fois par seconde et toutes les 100
+    # images : le coût par fichier se limite à un incrément de compteur
+    progress = tqdm(
+        _iter_image_infos(image_files, str(base_path)),
+        desc="Traitement des images",
+        mininterval=0.5,
+        miniters=100,
+        smoothing=0
+    )
+    # Les résultats arrivent dans l'ordre de découverte : seul ce thread
+    # accumule et écrit les lots, sans verrou
+    with (
+        PhotoSink(sqlite_path, batch_size) if sqlite_path else nullcontext()
+    ) as sink:
+        for file_path, file_info in progress:
+            if file_info is None:
+                failed_count += 1
+                if len(failed_files) < _FAILED_FILES_SHOWN:
+                    failed_files.append(file_path)
+            elif sink is None:
+                results.append(file_info)
+            elif sink.add(file_info):
+                # Affiché avec la barre au prochain rafraîchissement, sans
+                # imprimer une ligne et redessiner la barre à chaque lot
+                progress.set_postfix_str(
+                    f"{sink.total_saved} photos en BDD", refresh=False
+                )
+
+    print(f"Nombre de fichiers images trouvés: {progress.n}")
+
+    if failed_count:
+        print(f"\n{failed_count} fichiers n'ont pas pu être traités:")
+        for failed_file in failed_files:
             print(f"  - {failed_file}")
-        if len(failed_files) > 10:
-            print(f"  ... et {len(failed_files) - 10} autres")
+        if failed_count > len(failed_files):
+            print(f"  ... et {failed_count - len(failed_files)} autres")
 
     return results
 
 
+# Colonnes des fichiers de résultats, dans l'ordre d'écriture
+_RESULT_COLUMNS = ('repertoire', 'nom_fichier', 'hauteur', 'largeur')
+# Caractères qui obligent csv.writer à mettre un champ entre guillemets
+_CSV_NEEDS_QUOTING = re.compile(r'[,"\r\n]').search
+# Encodeur JSON réutilisé pour chaque photo : json.dumps avec des options
+# non par défaut recrée un JSONEncoder à chaque appel. Les lignes sont des
+# dictionnaires plats, la détection de références circulaires est inutile.
+_encode_json_row = json.JSONEncoder(
+    ensure_ascii=False, check_circular=False
+).encode
+
+
 def save_results_json(
-    results: List[Dict[str, str | int]],
-    output_path: Path
+    results: Iterable[Dict[str, str | int]],
+    output_path: Path,
+    total_photos: Optional[int] = None
 ) -> Path:
     """Sauvegarde les résultats au format JSON.
 
+    Les photos sont écrites une par ligne au fil de l'eau, sans construire
+    le document complet en mémoire.
+
     Args:
-        results: Liste des résultats à sauvegarder.
+        results: Résultats à sauvegarder (liste ou itérateur).
         output_path: Chemin du fichier de sortie.
+        total_photos: Nombre de résultats, obligatoire pour un itérateur
+            (sinon les résultats sont d'abord mis en liste).
 
     Returns:
         Chemin du fichier créé.
 
     """
+    if total_photos is None:
+        results = list(results)
+        total_photos = len(results)
     output_path.parent.mkdir(parents=True, exist_ok=True)
-    data = {
-        'timestamp': datetime.now().isoformat(),
-        'total_photos': len(results),
-        'photos': results
-    }
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    with open(
+        output_path, 'w', encoding='utf-8', buffering=_WRITE_BUFFER_SIZE
+    ) as f:
+        timestamp = json.dumps(datetime.now().isoformat())
+        f.write(
+            f'{{"timestamp": {timestamp}, '
+            f'"total_photos": {total_photos}, "photos": ['
+        )
+        separator = '\n'
+        for result in results:
+            f.write(separator)
+            f.write(_encode_json_row(result))
+            separator = ',\n'
+        f.write('\n]}\n')
     return output_path
 
 
 def save_results_csv(
-    results: List[Dict[str, str | int]],
+    results: Iterable[Dict[str, str | int]],
     output_path: Path
 ) -> Path:
     """Sauvegarde les résultats au format CSV.
 
     Args:
-        results: Liste des résultats à sauvegarder.
+        results: Résultats à sauvegarder (liste ou itérateur).
         output_path: Chemin du fichier de sortie.
 
     Returns:
@@ -199,20 +786,214 @@ def save_results_csv(
 
     """
     output_path.parent.mkdir(parents=True, exist_ok=True)
-    df = pd.DataFrame(results)
-    df.to_csv(output_path, index=False, encoding='utf-8-sig')
+    with open(
+        output_path, 'w', newline='', encoding='utf-8-sig',
+        buffering=_WRITE_BUFFER_SIZE
+    ) as f:
+        writer = csv.writer(f)
+        writer.writerow(_RESULT_COLUMNS)
+        # Hauteur et largeur sont des entiers : seuls les deux champs texte
+        # peuvent demander un échappement. Les lignes sans caractère spécial
+        # sont écrites directement, les autres passent par csv.writer.
+        write = f.write
+        for r in results:
+            directory, filename = r['repertoire'], r['nom_fichier']
+            if (
+                _CSV_NEEDS_QUOTING(str(directory))
+                or _CSV_NEEDS_QUOTING(str(filename))
+            ):
+                writer.writerow(
+                    (directory, filename, r['hauteur'], r['largeur'])
+                )
+            else:
+                write(
+                    f"{directory},{filename},{r['hauteur']},{r['largeur']}\r\n"
+                )
     return output_path
 
 
+class PhotoSink:
+    """Enregistre les photos dans la base SQLite par lots.
+
+    Une seule connexion sert pour tout le scan : les PRAGMAs, la création
+    des tables et l'enregistrement du scan (table scans) ne sont exécutés
+    qu'une fois, puis chaque lot est inséré dans sa propre transaction.
+    Les photos encore en attente sont enregistrées à la sortie du bloc
+    with, y compris quand une exception l'interrompt.
+    """
+
+    def __init__(
+        self,
+        sqlite_path: Path,
+        batch_size: int = _DEFAULT_BATCH_SIZE,
+        flush_interval: float = _FLUSH_INTERVAL_SECONDS
+    ) -> None:
+        """Ouvre la base et crée la table photos si besoin.
+
+        Args:
+            sqlite_path: Chemin vers la base SQLite.
+            batch_size: Nombre de photos par lot.
+            flush_interval: Délai en secondes au-delà duquel un lot
+                incomplet est enregistré.
+
+        """
+        sqlite_path.parent.mkdir(parents=True, exist_ok=True)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._last_flush = time.monotonic()
+        self.total_saved = 0
+        self._pending: List[Tuple[str | int, ...]] = []
+        self._conn = sqlite3.connect(sqlite_path)
+        for pragma in _SQLITE_WRITE_PRAGMAS:
+            self._conn.execute(f"PRAGMA {pragma}")
+        # La date est stockée une fois par scan, chaque photo ne porte que
+        # l'identifiant du scan ; nb_photos suit les insertions du scan
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS scans (
+                id INTEGER PRIMARY KEY,
+                scan_date TEXT NOT NULL,
+                nb_photos INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        # id est un alias du rowid, sans AUTOINCREMENT : pas de mise à jour
+        # de sqlite_sequence à chaque insertion
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS photos (
+                id INTEGER PRIMARY KEY,
+                repertoire TEXT NOT NULL,
+                nom_fichier TEXT NOT NULL,
+                hauteur INTEGER NOT NULL,
+                largeur INTEGER NOT NULL,
+                scan_id INTEGER NOT NULL REFERENCES scans(id)
+            )
+        ''')
+        cursor = self._conn.execute(
+            "INSERT INTO scans (scan_date) VALUES (?)",
+            (datetime.now().isoformat(),)
+        )
+        self._conn.commit()
+        self._scan_id = int(cursor.lastrowid or 0)
+
+    def __enter__(self) -> 'PhotoSink':
+        """Retourne le sink lui-même."""
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[type[BaseException]],
+        exc: Optional[BaseException],
+        traceback: Optional[TracebackType]
+    ) -> None:
+        """Enregistre le dernier lot, même en cas d'erreur, et ferme."""
+        try:
+            # Scan interrompu (erreur, Ctrl+C) : les photos déjà lues sont
+            # gardées
+            self.flush()
+        finally:
+            try:
+                # Base rendue en un seul fichier : le -wal est reporté puis
+                # supprimé, une ouverture en lecture seule n'écrit rien à côté
+                if not self._conn.in_transaction:
+                    self._conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+                    self._conn.execute('PRAGMA journal_mode=DELETE')
+            finally:
+                self._conn.close()
+
+    def add(self, result: Dict[str, str | int]) -> bool:
+        """Ajoute une photo, et enregistre le lot s'il est complet ou ancien.
+
+        Args:
+            result: Informations de la photo.
+
+        Returns:
+            True si un lot vient d'être enregistré, False sinon.
+
+        """
+        self._pending.append((
+            result['repertoire'],
+            result['nom_fichier'],
+            result['hauteur'],
+            result['largeur'],
+            self._scan_id
+        ))
+        if (
+            len(self._pending) < self.batch_size
+            and time.monotonic() - self._last_flush < self.flush_interval
+        ):
+            return False
+        self.flush()
+        return True
+
+    def add_all(self, results: Iterable[Dict[str, str | int]]) -> None:
+        """Enregistre d'un coup des photos, dans une seule transaction.
+
+        Les lignes sont produites à la volée pour executemany, sans liste
+        intermédiaire.
+
+        Args:
+            results: Informations des photos.
+
+        """
+        self.flush()
+        scan_id = self._scan_id
+        self._insert(
+            (
+                r['repertoire'],
+                r['nom_fichier'],
+                r['hauteur'],
+                r['largeur'],
+                scan_id
+            )
+            for r in results
+        )
+
+    def flush(self) -> None:
+        """Enregistre les photos en attente dans une transaction."""
+        if not self._pending:
+            return
+        self._insert(self._pending)
+        self._pending = []
+        self._last_flush = time.monotonic()
+
+    def _insert(self, rows: Iterable[Tuple[str | int, ...]]) -> None:
+        """Insère des lignes dans une transaction.
+
+        Le compteur nb_photos du scan est mis à jour dans la même
+        transaction : il reste exact même si le scan est interrompu.
+
+        Args:
+            rows: Lignes (repertoire, nom_fichier, hauteur, largeur,
+                scan_id) à insérer.
+
+        """
+        # Tout le lot dans une seule transaction, verrou d'écriture pris
+        # d'emblée
+        self._conn.execute("BEGIN IMMEDIATE")
+        cursor = self._conn.executemany('''
+            INSERT INTO photos (repertoire, nom_fichier, hauteur, largeur, scan_id)
+            VALUES (?, ?, ?, ?, ?)
+        ''', rows)
+        inserted = max(cursor.rowcount, 0)
+        self._conn.execute(
+            "UPDATE scans SET nb_photos = nb_photos + ? WHERE id = ?",
+            (inserted, self._scan_id)
+        )
+        self._conn.commit()
+        self.total_saved += inserted
+
+
 def save_results_sqlite(
-    results: List[Dict[str, str | int]],
+    results: Iterable[Dict[str, str | int]],
     output_path: Path,
     append: bool = False
 ) -> Path:
     """Sauvegarde les résultats dans une base SQLite.
 
+    Les résultats sont consommés au fil de l'eau : un générateur peut être
+    passé sans être d'abord mis en liste.
+
     Args:
-        results: Liste des résultats à sauvegarder.
+        results: Résultats à sauvegarder (liste ou itérateur).
         output_path: Chemin du fichier de sortie.
         append: Si True, ajoute les données à la base existante.
 
@@ -220,46 +1001,17 @@ def save_results_sqlite(
         Chemin du fichier créé.
 
     """
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(output_path)
-    cursor = conn.cursor()
-
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS photos (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            repertoire TEXT NOT NULL,
-            nom_fichier TEXT NOT NULL,
-            hauteur INTEGER NOT NULL,
-            largeur INTEGER NOT NULL,
-            scan_date TEXT NOT NULL
-        )
-    ''')
-
-    scan_date = datetime.now().isoformat()
-    data_to_insert = [
-        (
-            result['repertoire'],
-            result['nom_fichier'],
-            result['hauteur'],
-            result['largeur'],
-            scan_date
-        )
-        for result in results
-    ]
-
-    cursor.executemany('''
-        INSERT INTO photos (repertoire, nom_fichier, hauteur, largeur, scan_date)
-        VALUES (?, ?, ?, ?, ?)
-    ''', data_to_insert)
-
-    conn.commit()
-    conn.close()
+    with PhotoSink(output_path) as sink:
+        sink.add_all(results)
     return output_path
 
 
 def get_total_photos_count(sqlite_path: Path) -> int:
     """Récupère le nombre total de photos dans la base SQLite.
 
+    Chaque scan tient le compte de ses photos (table scans) : la somme est
+    lue sans parcourir la table photos.
+
     Args:
         sqlite_path: Chemin vers la base SQLite.
 
@@ -272,43 +1024,65 @@ def get_total_photos_count(sqlite_path: Path) -> int:
 
     conn = sqlite3.connect(sqlite_path)
     cursor = conn.cursor()
-    cursor.execute("SELECT COUNT(*) FROM photos")
+    cursor.execute("SELECT COALESCE(SUM(nb_photos), 0) FROM scans")
     result = cursor.fetchone()
     conn.close()
     return int(result[0]) if result else 0
 
 
-def load_all_photos_from_sqlite(sqlite_path: Path) -> List[Dict[str, str | int]]:
-    """Charge toutes les photos depuis la base SQLite.
+# Nombre de lignes lues à la fois lors du parcours de la base du scan
+_FETCH_SIZE = 10000
+
+
+def iter_photos_from_sqlite(
+    sqlite_path: Path
+) -> Iterator[Dict[str, str | int]]:
+    """Parcourt les photos de la base SQLite par blocs, sans tout charger.
 
     Args:
         sqlite_path: Chemin vers la base SQLite.
 
     Returns:
-        Liste de dictionnaires contenant toutes les photos.
+        Itérateur de dictionnaires, un par photo.
 
     """
     if not sqlite_path.exists():
-        return []
+        return
 
     conn = sqlite3.connect(sqlite_path)
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT repertoire, nom_fichier, hauteur, largeur
-        FROM photos
-    """)
-    rows = cursor.fetchall()
-    conn.close()
+    try:
+        cursor = conn.cursor()
+        cursor.arraysize = _FETCH_SIZE
+        cursor.execute("""
+            SELECT repertoire, nom_fichier, hauteur, largeur
+            FROM photos
+        """)
+        while True:
+            rows = cursor.fetchmany()
+            if not rows:
+                break
+            for row in rows:
+                yield {
+                    'repertoire': row[0],
+                    'nom_fichier': row[1],
+                    'hauteur': row[2],
+                    'largeur': row[3]
+                }
+    finally:
+        conn.close()
 
-    return [
-        {
-            'repertoire': row[0],
-            'nom_fichier': row[1],
-            'hauteur': row[2],
-            'largeur': row[3]
-        }
-        for row in rows
-    ]
+
+def load_all_photos_from_sqlite(sqlite_path: Path) -> List[Dict[str, str | int]]:
+    """Charge toutes les photos depuis la base SQLite.
+
+    Args:
+        sqlite_path: Chemin vers la base SQLite.
+
+    Returns:
+        Liste de dictionnaires contenant toutes les photos.
+
+    """
+    return list(iter_photos_from_sqlite(sqlite_path))
 
 
 def _load_photos_directory() -> str:
@@ -331,30 +1105,30 @@ def main() -> None:
 
     sqlite_path = output_dir / f"photos_scan_{timestamp}.db"
 
-    print("Sauvegarde par lots de 1000 photos dans la BDD SQLite")
+    print(
+        f"Sauvegarde par lots de {_DEFAULT_BATCH_SIZE} photos "
+        "dans la BDD SQLite"
+    )
     print(f"Base SQLite: {sqlite_path}\n")
 
-    results = scan_photos_directory(
+    scan_photos_directory(
         photos_directory,
         sqlite_path=sqlite_path,
-        batch_size=1000
+        batch_size=_DEFAULT_BATCH_SIZE
     )
 
-    if results:
-        save_results_sqlite(results, sqlite_path, append=True)
-        print(f"\n✓ {len(results)} photos restantes sauvegardées dans la BDD")
-
     total_in_db = get_total_photos_count(sqlite_path)
 
     if total_in_db > 0:
-        all_photos = load_all_photos_from_sqlite(sqlite_path)
-
+        # Les exports relisent la base au fil de l'eau plutôt que de
+        # charger toutes les photos en mémoire
         json_path = save_results_json(
-            all_photos,
-            output_dir / f"photos_scan_{timestamp}.json"
+            iter_photos_from_sqlite(sqlite_path),
+            output_dir / f"photos_scan_{timestamp}.json",
+            total_photos=total_in_db
         )
         csv_path = save_results_csv(
-            all_photos,
+            iter_photos_from_sqlite(sqlite_path),
             output_dir / f"photos_scan_{timestamp}.csv"
         )
 
@@ -367,10 +1141,10 @@ def main() -> None:
         print(f"  - CSV: {csv_path}")
         print(f"  - SQLite: {sqlite_path}")
 
-        if all_photos:
-            print("\nExemple de résultats (5 premiers):")
-            for i, result in enumerate(all_photos[:5], 1):
-                print(f"{i}. {result}")
+        print("\nExemple de résultats (5 premiers):")
+        examples = islice(iter_photos_from_sqlite(sqlite_path), 5)
+        for i, result in enumerate(examples, 1):
+            print(f"{i}. {result}")
     else:
         print("\nAucun résultat à sauvegarder.")
 
@@ -5,23 +5,27 @@ import sqlite3
 import os
 import tempfile
 from pathlib import Path
+from typing import Any, Dict, Iterator, List, Tuple
 from unittest.mock import patch, MagicMock
 import pytest
 import pandas as pd
-from PIL import Image
+from PIL import Image, UnidentifiedImageError
 
 from scan_photos import (
     get_image_dimensions,
     is_image_file,
     scan_directory,
+    iter_image_files,
     process_image_file,
     scan_photos_directory,
     save_results_json,
     save_results_csv,
     save_results_sqlite,
+    PhotoSink,
     get_total_photos_count,
     load_all_photos_from_sqlite,
-    _load_photos_directory
+    _load_photos_directory,
+    _iter_in_background
 )
 
 
@@ -37,6 +41,97 @@ def test_get_image_dimensions_valid_image(tmp_path: Path) -> None:
     assert result == (100, 200)
 
 
+def test_get_image_dimensions_header_formats(tmp_path: Path) -> None:
+    """Test get_image_dimensions lit l'en-tête des formats courants comme PIL."""
+    formats: Dict[str, Dict[str, Any]] = {
+        'test.jpg': {},
+        'test_progressive.jpg': {'progressive': True},
+        'test.png': {},
+        'test.gif': {},
+        'test.bmp': {},
+        'test.webp': {},
+        'test_lossless.webp': {'lossless': True},
+    }
+    img = Image.new('RGB', (321, 123), color='red')
+    for name, options in formats.items():
+        img_path = tmp_path / name
+        img.save(img_path, **options)
+        assert get_image_dimensions(img_path) == (321, 123), name
+
+    # WebP étendu (VP8X) : avec un canal alpha
+    rgba_path = tmp_path / "test_alpha.webp"
+    Image.new('RGBA', (77, 55)).save(rgba_path)
+    assert get_image_dimensions(rgba_path) == (77, 55)
+
+
+def test_get_image_dimensions_tiff_header(tmp_path: Path) -> None:
+    """Test get_image_dimensions lit le premier IFD des TIFF et RAW TIFF."""
+    # Petit boutiste, largeur en LONG, et RAW de structure TIFF
+    little_path = tmp_path / "test.tif"
+    Image.new('RGB', (70000, 2)).save(little_path)
+    raw_path = tmp_path / "test.dng"
+    Image.new('RGB', (321, 123)).save(raw_path, format='TIFF')
+    # Grand boutiste
+    big_path = tmp_path / "test.tiff"
+    Image.new('I;16B', (45, 67)).save(big_path)
+
+    for img_path in (little_path, raw_path, big_path):
+        with Image.open(img_path) as img:
+            assert get_image_dimensions(img_path) == img.size, img_path.name
+
+
+def _save_orf(img_path: Path, size: Tuple[int, int]) -> None:
+    """Enregistre un ORF : un TIFF avec la signature Olympus IIRO."""
+    Image.new('RGB', size).save(img_path, format='TIFF')
+    with open(img_path, 'r+b') as f:
+        f.write(b'IIRO')
+
+
+def test_get_image_dimensions_orf_header(tmp_path: Path) -> None:
+    """Test get_image_dimensions lit l'en-tête ORF, que PIL ne reconnaît pas."""
+    img_path = tmp_path / "test.orf"
+    _save_orf(img_path, (321, 123))
+
+    with pytest.raises(UnidentifiedImageError):
+        Image.open(img_path)
+    assert get_image_dimensions(img_path) == (321, 123)
+
+
+def test_get_image_dimensions_bad_header_falls_back(tmp_path: Path) -> None:
+    """Test get_image_dimensions avec une extension qui ne correspond pas."""
+    img_path = tmp_path / "test.jpg"
+    Image.new('RGB', (40, 30)).save(img_path, format='PPM')
+
+    assert get_image_dimensions(img_path) == (40, 30)
+
+
+# PIL signale les tags TIFF tronqués par des avertissements
+@pytest.mark.filterwarnings('ignore::UserWarning')
+def test_get_image_dimensions_truncated_like_pil(tmp_path: Path) -> None:
+    """Test get_image_dimensions rejette les fichiers tronqués comme PIL."""
+    formats: Dict[str, Tuple[str, Dict[str, Any]]] = {
+        'test.jpg': ('RGB', {}),
+        'test.png': ('P', {}),
+        'test.gif': ('L', {}),
+        'test.bmp': ('RGB', {}),
+        'test.webp': ('RGBA', {}),
+        'test_lossless.webp': ('RGB', {'lossless': True}),
+        'test.tif': ('L', {'compression': 'tiff_lzw'}),
+    }
+    for name, (mode, options) in formats.items():
+        img_path = tmp_path / name
+        Image.new(mode, (21, 13)).save(img_path, **options)
+        data = img_path.read_bytes()
+        for length in range(min(len(data), 1024)):
+            img_path.write_bytes(data[:length])
+            try:
+                with Image.open(img_path) as img:
+                    expected = img.size
+            except (OSError, SyntaxError, ValueError, EOFError):
+                expected = None
+            assert get_image_dimensions(img_path) == expected, (name, length)
+
+
 def test_get_image_dimensions_invalid_file(tmp_path: Path) -> None:
     """Test get_image_dimensions avec un fichier invalide."""
     invalid_path = tmp_path / "invalid.txt"
@@ -46,6 +141,23 @@ def test_get_image_dimensions_invalid_file(tmp_path: Path) -> None:
     assert result is None
 
 
+def test_get_image_dimensions_unexpected_error(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    capsys: pytest.CaptureFixture[str]
+) -> None:
+    """Test get_image_dimensions quand un plugin PIL lève une erreur imprévue."""
+    img_path = tmp_path / "test.raw"
+    img_path.write_bytes(b"metadonnees malformees")
+
+    def broken_open(path: Path) -> None:
+        raise KeyError("tag")
+    monkeypatch.setattr('scan_photos.Image.open', broken_open)
+
+    assert get_image_dimensions(img_path) is None
+    assert "test.raw" in capsys.readouterr().err
+
+
 def test_get_image_dimensions_nonexistent_file(tmp_path: Path) -> None:
     """Test get_image_dimensions avec un fichier inexistant."""
     nonexistent_path = tmp_path / "nonexistent.jpg"
@@ -89,6 +201,13 @@ def test_is_image_file_case_insensitive() -> None:
     assert is_image_file(file_path) is True
 
 
+def test_is_image_file_hidden_without_extension() -> None:
+    """Test is_image_file avec un fichier caché nommé seulement .jpg."""
+    assert is_image_file(Path("photos") / ".jpg") is False
+    assert is_image_file(".JPG") is False
+    assert is_image_file(Path("photos") / ".cache.jpg") is True
+
+
 def test_scan_directory_with_images(tmp_path: Path) -> None:
     """Test scan_directory avec des images."""
     # Créer des images de test
@@ -97,12 +216,29 @@ def test_scan_directory_with_images(tmp_path: Path) -> None:
     img1.save(tmp_path / "image1.jpg")
     img2.save(tmp_path / "image2.png")
     (tmp_path / "not_image.txt").write_text("text")
+    # Fichier caché sans extension, ignoré comme par Path.suffix
+    (tmp_path / ".jpg").write_text("text")
 
     result = scan_directory(tmp_path)
     assert len(result) == 2
     assert all(is_image_file(f) for f in result)
 
 
+def test_scan_directory_symlinks(tmp_path: Path) -> None:
+    """Test scan_directory avec des liens vers un fichier et un répertoire."""
+    photos_dir = tmp_path / "photos"
+    photos_dir.mkdir()
+    Image.new('RGB', (10, 10)).save(tmp_path / "image.jpg")
+    (tmp_path / "album").mkdir()
+    (photos_dir / "lien.jpg").symlink_to(tmp_path / "image.jpg")
+    (photos_dir / "album.jpg").symlink_to(
+        tmp_path / "album", target_is_directory=True
+    )
+
+    result = scan_directory(photos_dir)
+    assert [os.path.basename(f) for f in result] == ["lien.jpg"]
+
+
 def test_scan_directory_empty(tmp_path: Path) -> None:
     """Test scan_directory avec un répertoire vide."""
     result = scan_directory(tmp_path)
@@ -128,6 +264,37 @@ def test_scan_directory_subdirectories(tmp_path: Path) -> None:
     assert len(result) == 2
 
 
+def test_scan_directory_many_subdirectories(tmp_path: Path) -> None:
+    """Test scan_directory sur un arbre ramifié (parcours multi-thread)."""
+    img = Image.new('RGB', (10, 10), color='red')
+    expected = set()
+    for i in range(6):
+        subdir = tmp_path / f"dossier{i}" / "sous-dossier"
+        subdir.mkdir(parents=True)
+        img.save(subdir / f"image{i}.jpg")
+        (subdir / "notes.txt").write_text("text")
+        expected.add(str(subdir / f"image{i}.jpg"))
+
+    assert set(scan_directory(tmp_path)) == expected
+
+
+def test_iter_in_background() -> None:
+    """Test _iter_in_background : ordre, arrêt anticipé et erreurs."""
+    assert list(_iter_in_background(range(50), maxsize=4)) == list(range(50))
+
+    # Arrêt anticipé : le producteur bloqué sur la file est libéré
+    items = _iter_in_background(range(100000), maxsize=4)
+    assert [next(items), next(items)] == [0, 1]
+    items.close()
+
+    def failing() -> Iterator[int]:
+        yield 1
+        raise OSError("partage déconnecté")
+
+    with pytest.raises(OSError):
+        list(_iter_in_background(failing(), maxsize=4))
+
+
 def test_process_image_file_valid(tmp_path: Path) -> None:
     """Test process_image_file avec une image valide."""
     base_dir = tmp_path
@@ -168,7 +335,7 @@ def test_process_image_file_subdirectory(tmp_path: Path) -> None:
     assert result['nom_fichier'] == "photo.jpg"
 
 
-@patch('scan_photos.scan_directory')
+@patch('scan_photos.iter_image_files')
 @patch('scan_photos.process_image_file')
 def test_scan_photos_directory_success(
     mock_process: MagicMock,
@@ -222,6 +389,28 @@ def test_scan_photos_directory_with_failures(tmp_path: Path) -> None:
     assert result[0]['nom_fichier'] == "valid.jpg"
 
 
+def test_scan_photos_directory_parallel(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test scan_photos_directory en mode multi-thread (ordre conservé)."""
+    for i in range(5):
+        Image.new('RGB', (10 + i, 20), color='red').save(tmp_path / f"img{i}.png")
+    # Un ORF (lu dans l'en-tête) dans un sous-répertoire
+    (tmp_path / "raw").mkdir()
+    _save_orf(tmp_path / "raw" / "img.orf", (30, 40))
+    (tmp_path / "invalid.jpg").write_text("text")
+
+    serial = scan_photos_directory(tmp_path)
+    monkeypatch.setattr('scan_photos._PARALLEL_SCAN_THRESHOLD', 1)
+    parallel = scan_photos_directory(tmp_path)
+
+    assert len(parallel) == 6
+    assert parallel == serial
+    assert {'repertoire': 'raw', 'nom_fichier': 'img.orf',
+            'hauteur': 40, 'largeur': 30} in parallel
+
+
 def test_save_results_json(tmp_path: Path) -> None:
     """Test save_results_json."""
     results = [
@@ -274,6 +463,22 @@ def test_save_results_csv(tmp_path: Path) -> None:
     assert df.iloc[0]['hauteur'] == 100
 
 
+def test_save_results_csv_quoting(tmp_path: Path) -> None:
+    """Test save_results_csv avec des virgules et guillemets dans les noms."""
+    results: List[Dict[str, str | int]] = [
+        {'repertoire': 'test', 'nom_fichier': 'simple.jpg', 'hauteur': 1, 'largeur': 2},
+        {'repertoire': 'Paris, 2024', 'nom_fichier': 'le "pont".jpg', 'hauteur': 3, 'largeur': 4},
+    ]
+    output_path = tmp_path / "test.csv"
+    save_results_csv(results, output_path)
+
+    df = pd.read_csv(output_path)
+    assert list(df.columns) == ['repertoire', 'nom_fichier', 'hauteur', 'largeur']
+    assert df.iloc[1]['repertoire'] == 'Paris, 2024'
+    assert df.iloc[1]['nom_fichier'] == 'le "pont".jpg'
+    assert df.iloc[1]['largeur'] == 4
+
+
 def test_save_results_sqlite(tmp_path: Path) -> None:
     """Test save_results_sqlite."""
     results = [
@@ -317,6 +522,63 @@ def test_save_results_sqlite(tmp_path: Path) -> None:
     assert row[4] == 200  # largeur
 
 
+def test_photo_sink_batches(tmp_path: Path) -> None:
+    """Test PhotoSink : lots complets enregistrés, reste écrit à la sortie."""
+    db_path = tmp_path / "sink.db"
+    photo: Dict[str, str | int] = {'repertoire': 'a', 'nom_fichier': 'b.jpg', 'hauteur': 1, 'largeur': 2}
+
+    with PhotoSink(db_path, batch_size=2) as sink:
+        assert sink.add(photo) is False
+        assert sink.add(photo) is True
+        assert sink.add(photo) is False
+        assert sink.total_saved == 2
+        assert get_total_photos_count(db_path) == 2
+
+    assert sink.total_saved == 3
+    assert get_total_photos_count(db_path) == 3
+
+
+def test_photo_sink_flush_interval(tmp_path: Path) -> None:
+    """Test PhotoSink : un lot incomplet est enregistré après le délai."""
+    db_path = tmp_path / "sink.db"
+    photo: Dict[str, str | int] = {'repertoire': 'a', 'nom_fichier': 'b.jpg', 'hauteur': 1, 'largeur': 2}
+
+    with PhotoSink(db_path, batch_size=1000, flush_interval=0.0) as sink:
+        assert sink.add(photo) is True
+        assert get_total_photos_count(db_path) == 1
+
+
+def test_photo_sink_flushes_on_error(tmp_path: Path) -> None:
+    """Test PhotoSink : le lot en attente est enregistré si le scan échoue."""
+    db_path = tmp_path / "sink.db"
+    photo: Dict[str, str | int] = {
+        'repertoire': 'a', 'nom_fichier': 'b.jpg', 'hauteur': 1, 'largeur': 2
+    }
+
+    with pytest.raises(KeyboardInterrupt):
+        with PhotoSink(db_path, batch_size=1000) as sink:
+            sink.add(photo)
+            raise KeyboardInterrupt
+
+    assert get_total_photos_count(db_path) == 1
+
+
+def test_photo_sink_single_file_on_close(tmp_path: Path) -> None:
+    """Test PhotoSink : la base fermée tient en un seul fichier, sans -wal."""
+    db_path = tmp_path / "scan.db"
+    with PhotoSink(db_path) as sink:
+        sink.add({'repertoire': '.', 'nom_fichier': 'a.jpg',
+                  'hauteur': 1, 'largeur': 2})
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['scan.db']
+    conn = sqlite3.connect(db_path)
+    try:
+        assert conn.execute('PRAGMA journal_mode').fetchone() == ('delete',)
+        assert conn.execute('SELECT COUNT(*) FROM photos').fetchone() == (1,)
+    finally:
+        conn.close()
+
+
 def test_save_results_sqlite_append(tmp_path: Path) -> None:
     """Test save_results_sqlite avec append=True."""
     results1 = [
@@ -349,6 +611,68 @@ def test_save_results_sqlite_append(tmp_path: Path) -> None:
     assert count == 2
 
 
+def test_save_results_sqlite_scan_table(tmp_path: Path) -> None:
+    """Test que chaque sauvegarde enregistre un scan référencé par ses photos."""
+    photo: Dict[str, str | int] = {'repertoire': 'a', 'nom_fichier': 'b.jpg', 'hauteur': 1, 'largeur': 2}
+    output_path = tmp_path / "test.db"
+
+    save_results_sqlite([photo], output_path)
+    save_results_sqlite([photo, photo], output_path, append=True)
+
+    conn = sqlite3.connect(output_path)
+    rows = conn.execute("""
+        SELECT s.id, COUNT(p.id), MIN(s.scan_date)
+        FROM scans s JOIN photos p ON p.scan_id = s.id
+        GROUP BY s.id ORDER BY s.id
+    """).fetchall()
+    conn.close()
+
+    assert [(scan_id, count) for scan_id, count, _ in rows] == [(1, 1), (2, 2)]
+    assert all(scan_date for _, _, scan_date in rows)
+
+
+def test_get_total_photos_count_per_scan(tmp_path: Path) -> None:
+    """Test get_total_photos_count : compte tenu par scan, égal à COUNT(*)."""
+    photo: Dict[str, str | int] = {
+        'repertoire': 'a', 'nom_fichier': 'b.jpg', 'hauteur': 1, 'largeur': 2
+    }
+    output_path = tmp_path / "test.db"
+
+    save_results_sqlite([photo, photo], output_path)
+    # Scan interrompu : le lot en attente est enregistré à la sortie
+    with pytest.raises(KeyboardInterrupt):
+        with PhotoSink(output_path, batch_size=2) as sink:
+            for _ in range(3):
+                sink.add(photo)
+            raise KeyboardInterrupt
+
+    conn = sqlite3.connect(output_path)
+    per_scan = conn.execute("""
+        SELECT s.nb_photos, COUNT(p.id)
+        FROM scans s LEFT JOIN photos p ON p.scan_id = s.id
+        GROUP BY s.id ORDER BY s.id
+    """).fetchall()
+    total = conn.execute("SELECT COUNT(*) FROM photos").fetchone()[0]
+    conn.close()
+
+    assert per_scan == [(2, 2), (3, 3)]
+    assert get_total_photos_count(output_path) == total == 5
+
+
+def test_save_results_sqlite_generator(tmp_path: Path) -> None:
+    """Test save_results_sqlite avec un générateur de résultats."""
+    output_path = tmp_path / "test.db"
+    results: Iterator[Dict[str, str | int]] = (
+        {'repertoire': 'a', 'nom_fichier': f'{i}.jpg', 'hauteur': i, 'largeur': i}
+        for i in range(1, 4)
+    )
+
+    save_results_sqlite(results, output_path)
+
+    loaded = load_all_photos_from_sqlite(output_path)
+    assert [photo['nom_fichier'] for photo in loaded] == ['1.jpg', '2.jpg', '3.jpg']
+
+
 def test_get_total_photos_count_existing(tmp_path: Path) -> None:
     """Test get_total_photos_count avec une base existante."""
     results = [
@@ -464,7 +788,7 @@ def test_load_photos_directory_default(
     mock_load_dotenv.assert_called_once()
 
 
-@patch('scan_photos.scan_directory')
+@patch('scan_photos.iter_image_files')
 @patch('scan_photos.process_image_file')
 def test_scan_photos_directory_with_batch_save(
     mock_process: MagicMock,
@@ -520,7 +844,7 @@ def test_scan_photos_directory_with_failed_files_display(tmp_path: Path) -> None
 
 
 @patch('scan_photos.process_image_file')
-@patch('scan_photos.scan_directory')
+@patch('scan_photos.iter_image_files')
 def test_scan_photos_directory_with_process_failures(
     mock_scan: MagicMock,
     mock_process: MagicMock,
@@ -549,11 +873,12 @@ def test_scan_photos_directory_with_process_failures(
 
 
 @patch('scan_photos.process_image_file')
-@patch('scan_photos.scan_directory')
+@patch('scan_photos.iter_image_files')
 def test_scan_photos_directory_with_many_failed_files(
     mock_scan: MagicMock,
     mock_process: MagicMock,
-    tmp_path: Path
+    tmp_path: Path,
+    capsys: pytest.CaptureFixture[str]
 ) -> None:
     """Test scan_photos_directory avec plus de 10 fichiers échoués."""
     # Créer 15 fichiers images
@@ -573,12 +898,18 @@ def test_scan_photos_directory_with_many_failed_files(
     assert len(result) == 0
     # Tous les fichiers devraient être dans failed_files
     assert mock_process.call_count == 15
+    # Les 10 premiers sont listés, les autres seulement comptés
+    output = capsys.readouterr().out
+    assert "15 fichiers n'ont pas pu être traités" in output
+    assert str(image_files[9]) in output
+    assert str(image_files[10]) not in output
+    assert "... et 5 autres" in output
 
 
 @patch('scan_photos.scan_photos_directory')
 @patch('scan_photos.save_results_sqlite')
 @patch('scan_photos.get_total_photos_count')
-@patch('scan_photos.load_all_photos_from_sqlite')
+@patch('scan_photos.iter_photos_from_sqlite')
 @patch('scan_photos.save_results_json')
 @patch('scan_photos.save_results_csv')
 @patch('scan_photos._load_photos_directory')
@@ -586,7 +917,7 @@ def test_main_with_results(
     mock_load_dir: MagicMock,
     mock_save_csv: MagicMock,
     mock_save_json: MagicMock,
-    mock_load_all: MagicMock,
+    mock_iter_photos: MagicMock,
     mock_get_count: MagicMock,
     mock_save_sqlite: MagicMock,
     mock_scan: MagicMock,
@@ -600,9 +931,9 @@ def test_main_with_results(
         {'repertoire': '.', 'nom_fichier': 'img1.jpg', 'hauteur': 100, 'largeur': 200}
     ]
     mock_get_count.return_value = 1
-    mock_load_all.return_value = [
+    mock_iter_photos.return_value = iter([
         {'repertoire': '.', 'nom_fichier': 'img1.jpg', 'hauteur': 100, 'largeur': 200}
-    ]
+    ])
     
     main()
     
@@ -610,9 +941,12 @@ def test_main_with_results(
     mock_load_dir.assert_called_once()
     mock_scan.assert_called_once()
     mock_get_count.assert_called_once()
-    mock_load_all.assert_called_once()
+    mock_iter_photos.assert_called()
     mock_save_json.assert_called_once()
+    assert mock_save_json.call_args.kwargs['total_photos'] == 1
     mock_save_csv.assert_called_once()
+    # Les photos sont déjà dans la base, écrite par scan_photos_directory
+    mock_save_sqlite.assert_not_called()
 
 
 @patch('scan_photos.scan_photos_directory')
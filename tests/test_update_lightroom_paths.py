@@ -1,9 +1,9 @@
 """Tests pour le module update_lightroom_paths."""
 
+import shutil
 import sqlite3
-import tempfile
 from pathlib import Path
-from typing import Dict, List, Generator
+from typing import Dict, List, Generator, Tuple
 
 import pytest
 
@@ -22,133 +22,338 @@ from update_lightroom_paths import (
     _find_best_match_for_file,
     _normalize_path_for_comparison,
     _group_matches_by_root,
+    _count_files_by_root,
+    _connect_readonly,
+    _escape_like,
+    _find_root_folders_without_matches,
+    _load_root_folder_index,
+    _load_files_by_root,
+    _merge_root_folders,
+    _process_root_folders_without_matches,
+    _set_root_folder_path,
     _load_dry_run_mode,
     _load_photos_directory,
     _load_scan_db_filename,
     _load_catalog_filename,
+    _ensure_dotenv_loaded,
 )
 
 
-@pytest.fixture
-def temp_scan_db() -> Generator[Path, None, None]:
-    """Crée une base de données temporaire pour les tests."""
-    db_file = tempfile.NamedTemporaryFile(
-        delete=False,
-        suffix='.db'
+_INSERT_LIBRARY_FILE = '''
+    INSERT INTO AgLibraryFile (id_local, id_global, baseName, extension, folder, idx_filename, lc_idx_filename, lc_idx_filenameExtension, originalFilename)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+
+# Bases jetables : la durabilité n'a pas d'importance, aucune écriture n'a
+# besoin d'atteindre le disque avant la fermeture de la connexion
+_FIXTURE_PRAGMAS = (
+    'synchronous=OFF',
+    'journal_mode=MEMORY',
+    'temp_store=MEMORY',
+    'locking_mode=EXCLUSIVE',
+    'cache_size=-20000',
+)
+
+
+def _apply_fixture_pragmas(conn: sqlite3.Connection) -> None:
+    """Configure une connexion de création de base de test pour la vitesse.
+
+    Args:
+        conn: Connexion ouverte sur la base à créer.
+
+    """
+    for pragma in _FIXTURE_PRAGMAS:
+        conn.execute(f'PRAGMA {pragma}')
+
+
+def _library_file_row(
+    id_local: int,
+    base_name: str,
+    extension: str,
+    folder_id: int
+) -> Tuple[int, str, str, str, int, str, str, str, str]:
+    """Construit une ligne AgLibraryFile (colonnes de _INSERT_LIBRARY_FILE)."""
+    filename = f'{base_name}.{extension}'
+    return (
+        id_local, f'guid{id_local}', base_name, extension, folder_id,
+        filename, filename, filename, filename
+    )
+
+
+def _new_root_path(folder: str) -> str:
+    """Construit le nouveau chemin réseau attendu pour test/<folder>."""
+    return '\\'.join((r'\\hal9001\Volume_1\photos\test', folder, ''))
+
+
+def _make_lightroom_file(
+    id_local: int = 100,
+    base_name: str = 'photo1',
+    root_folder_id: int = 1,
+) -> LightroomFile:
+    """Construit un fichier Lightroom du catalogue de test.
+
+    Le root_folder N correspond au dossier G:/old/path/folderN/, dont le
+    dossier racine a l'identifiant 10 * N.
+
+    """
+    return LightroomFile(
+        id_local=id_local,
+        base_name=base_name,
+        extension='jpg',
+        folder_id=10 * root_folder_id,
+        root_folder_id=root_folder_id,
+        old_absolute_path=f'G:/old/path/folder{root_folder_id}/',
+        path_from_root=''
+    )
+
+
+def _make_match(
+    id_local: int = 100,
+    base_name: str = 'photo1',
+    root_folder_id: int = 1,
+    scan_id: int = 1,
+) -> MatchResult:
+    """Construit la correspondance d'un fichier avec test/folderN du scan."""
+    folder = f'folder{root_folder_id}'
+    return MatchResult(
+        lightroom_file=_make_lightroom_file(id_local, base_name, root_folder_id),
+        photo_scan=PhotoScan(
+            id=scan_id,
+            repertoire=f'test/{folder}',
+            nom_fichier=f'{base_name}.jpg'
+        ),
+        new_absolute_path=_new_root_path(folder),
+        confidence=0.8
     )
-    db_path = Path(db_file.name)
-    db_file.close()
+
+
+@pytest.fixture(scope="session")
+def temp_scan_db(tmp_path_factory: pytest.TempPathFactory) -> Path:
+    """Crée une base de données temporaire pour les tests.
+
+    La base du scan n'est jamais modifiée par les tests : elle est créée
+    une seule fois pour toute la session.
+
+    """
+    db_path = tmp_path_factory.mktemp('scan') / 'scan.db'
+
+    rows = [
+        (1, 'test/folder1', 'photo1.jpg', 100, 200),
+        (2, 'test/folder2', 'photo2.jpg', 150, 250),
+        (3, 'test/folder1', 'photo3.png', 200, 300),
+    ]
 
     conn = sqlite3.connect(str(db_path))
-    cursor = conn.cursor()
+    _apply_fixture_pragmas(conn)
+    with conn:
+        conn.execute('BEGIN IMMEDIATE')
+        conn.execute('''
+            CREATE TABLE photos (
+                id INTEGER PRIMARY KEY,
+                repertoire TEXT NOT NULL,
+                nom_fichier TEXT NOT NULL,
+                hauteur INTEGER,
+                largeur INTEGER,
+                scan_date TEXT
+            )
+        ''')
+        conn.executemany('''
+            INSERT INTO photos (id, repertoire, nom_fichier, hauteur, largeur)
+            VALUES (?, ?, ?, ?, ?)
+        ''', rows)
+    conn.close()
 
-    cursor.execute('''
-        CREATE TABLE photos (
-            id INTEGER PRIMARY KEY,
-            repertoire TEXT NOT NULL,
-            nom_fichier TEXT NOT NULL,
-            hauteur INTEGER,
-            largeur INTEGER,
-            scan_date TEXT
-        )
-    ''')
+    return db_path
 
-    cursor.execute('''
-        INSERT INTO photos (id, repertoire, nom_fichier, hauteur, largeur)
-        VALUES
-            (1, 'test/folder1', 'photo1.jpg', 100, 200),
-            (2, 'test/folder2', 'photo2.jpg', 150, 250),
-            (3, 'test/folder1', 'photo3.png', 200, 300)
-    ''')
 
-    conn.commit()
+def _populate_lightroom_catalog(conn: sqlite3.Connection) -> None:
+    """Crée les tables et les lignes du catalogue Lightroom de test.
+
+    Args:
+        conn: Connexion vers une base vide (fichier ou mémoire).
+
+    """
+    root_folders = [
+        (1, 'guid1', 'G:/old/path/folder1/', 'folder1'),
+        (2, 'guid2', 'G:/old/path/folder2/', 'folder2'),
+    ]
+    folders = [
+        (10, 'guid10', '', 1),
+        (20, 'guid20', '', 2),
+    ]
+    files = [
+        _library_file_row(100, 'photo1', 'jpg', 10),
+        _library_file_row(200, 'photo2', 'jpg', 20),
+    ]
+
+    # sqlite3 n'ouvre pas de transaction implicite avant un CREATE TABLE :
+    # BEGIN IMMEDIATE regroupe le schéma et les lignes en un seul commit
+    with conn:
+        conn.execute('BEGIN IMMEDIATE')
+        conn.execute('''
+            CREATE TABLE AgLibraryRootFolder (
+                id_local INTEGER PRIMARY KEY,
+                id_global TEXT,
+                absolutePath TEXT NOT NULL,
+                name TEXT NOT NULL,
+                relativePathFromCatalog TEXT
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE AgLibraryFolder (
+                id_local INTEGER PRIMARY KEY,
+                id_global TEXT,
+                parentId INTEGER,
+                pathFromRoot TEXT NOT NULL,
+                rootFolder INTEGER NOT NULL,
+                visibility INTEGER
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE AgLibraryFile (
+                id_local INTEGER PRIMARY KEY,
+                id_global TEXT,
+                baseName TEXT NOT NULL,
+                extension TEXT NOT NULL,
+                folder INTEGER NOT NULL,
+                idx_filename TEXT NOT NULL,
+                lc_idx_filename TEXT NOT NULL,
+                lc_idx_filenameExtension TEXT NOT NULL,
+                originalFilename TEXT NOT NULL
+            )
+        ''')
+        conn.executemany('''
+            INSERT INTO AgLibraryRootFolder (id_local, id_global, absolutePath, name)
+            VALUES (?, ?, ?, ?)
+        ''', root_folders)
+        conn.executemany('''
+            INSERT INTO AgLibraryFolder (id_local, id_global, pathFromRoot, rootFolder)
+            VALUES (?, ?, ?, ?)
+        ''', folders)
+        conn.executemany(_INSERT_LIBRARY_FILE, files)
+
+
+@pytest.fixture(scope="session")
+def lightroom_catalog_memory_template(
+) -> Generator[sqlite3.Connection, None, None]:
+    """Crée une fois par session le catalogue de test, en mémoire.
+
+    Les autres fixtures du catalogue en sont des copies faites avec l'API
+    de sauvegarde de SQLite, qui recopie les pages sans refaire le schéma
+    ni les insertions.
+
+    """
+    conn = sqlite3.connect(':memory:')
+    _populate_lightroom_catalog(conn)
+    yield conn
     conn.close()
 
-    yield db_path
 
-    db_path.unlink()
+def _copy_catalog_to_file(
+    template: sqlite3.Connection,
+    catalog_path: Path,
+) -> Path:
+    """Recopie le catalogue en mémoire dans un fichier.
+
+    Args:
+        template: Connexion vers le catalogue en mémoire.
+        catalog_path: Chemin du fichier à créer.
+
+    Returns:
+        Chemin du fichier créé.
+
+    """
+    conn = sqlite3.connect(str(catalog_path))
+    _apply_fixture_pragmas(conn)
+    template.backup(conn)
+    conn.close()
+    return catalog_path
+
+
+@pytest.fixture(scope="session")
+def lightroom_catalog_template(
+    lightroom_catalog_memory_template: sqlite3.Connection,
+    tmp_path_factory: pytest.TempPathFactory,
+) -> Path:
+    """Écrit une fois par session un catalogue Lightroom de référence.
+
+    Les tests qui ne font que lire le catalogue l'utilisent directement ;
+    ceux qui le modifient passent par temp_lightroom_catalog.
+
+    """
+    return _copy_catalog_to_file(
+        lightroom_catalog_memory_template,
+        tmp_path_factory.mktemp('catalog') / 'template.lrcat'
+    )
 
 
 @pytest.fixture
-def temp_lightroom_catalog() -> Generator[Path, None, None]:
-    """Crée un catalogue Lightroom temporaire pour les tests."""
-    catalog_file = tempfile.NamedTemporaryFile(
-        delete=False,
-        suffix='.lrcat'
+def temp_lightroom_catalog(
+    lightroom_catalog_memory_template: sqlite3.Connection,
+    tmp_path: Path,
+) -> Path:
+    """Copie le catalogue de référence pour un test qui le modifie."""
+    return _copy_catalog_to_file(
+        lightroom_catalog_memory_template,
+        tmp_path / 'catalog.lrcat'
     )
-    catalog_path = Path(catalog_file.name)
-    catalog_file.close()
 
-    conn = sqlite3.connect(str(catalog_path))
-    cursor = conn.cursor()
 
-    cursor.execute('''
-        CREATE TABLE AgLibraryRootFolder (
-            id_local INTEGER PRIMARY KEY,
-            id_global TEXT,
-            absolutePath TEXT NOT NULL,
-            name TEXT NOT NULL,
-            relativePathFromCatalog TEXT
-        )
-    ''')
+@pytest.fixture(scope="session")
+def scan_photos_by_filename(temp_scan_db: Path) -> Dict[str, List[PhotoScan]]:
+    """Charge une fois par session les photos de la base du scan.
 
-    cursor.execute('''
-        CREATE TABLE AgLibraryFolder (
-            id_local INTEGER PRIMARY KEY,
-            id_global TEXT,
-            parentId INTEGER,
-            pathFromRoot TEXT NOT NULL,
-            rootFolder INTEGER NOT NULL,
-            visibility INTEGER
-        )
-    ''')
+    Les fonctions testées ne modifient ni le dictionnaire ni ses listes.
 
-    cursor.execute('''
-        CREATE TABLE AgLibraryFile (
-            id_local INTEGER PRIMARY KEY,
-            id_global TEXT,
-            baseName TEXT NOT NULL,
-            extension TEXT NOT NULL,
-            folder INTEGER NOT NULL,
-            idx_filename TEXT NOT NULL,
-            lc_idx_filename TEXT NOT NULL,
-            lc_idx_filenameExtension TEXT NOT NULL,
-            originalFilename TEXT NOT NULL
-        )
-    ''')
+    """
+    return load_scan_photos(temp_scan_db)
 
-    cursor.execute('''
-        INSERT INTO AgLibraryRootFolder (id_local, id_global, absolutePath, name)
-        VALUES
-            (1, 'guid1', 'G:/old/path/folder1/', 'folder1'),
-            (2, 'guid2', 'G:/old/path/folder2/', 'folder2')
-    ''')
 
-    cursor.execute('''
-        INSERT INTO AgLibraryFolder (id_local, id_global, pathFromRoot, rootFolder)
-        VALUES
-            (10, 'guid10', '', 1),
-            (20, 'guid20', '', 2)
-    ''')
+@pytest.fixture(scope="session")
+def lightroom_files(lightroom_catalog_template: Path) -> List[LightroomFile]:
+    """Charge une fois par session les fichiers du catalogue de référence."""
+    return load_lightroom_files(lightroom_catalog_template)
 
-    cursor.execute('''
-        INSERT INTO AgLibraryFile (id_local, id_global, baseName, extension, folder, idx_filename, lc_idx_filename, lc_idx_filenameExtension, originalFilename)
-        VALUES
-            (100, 'guid100', 'photo1', 'jpg', 10, 'photo1.jpg', 'photo1.jpg', 'photo1.jpg', 'photo1.jpg'),
-            (200, 'guid200', 'photo2', 'jpg', 20, 'photo2.jpg', 'photo2.jpg', 'photo2.jpg', 'photo2.jpg')
-    ''')
 
-    conn.commit()
+@pytest.fixture
+def lr_conn(
+    temp_lightroom_catalog: Path,
+) -> Generator[sqlite3.Connection, None, None]:
+    """Ouvre une fois la copie du catalogue, pour préparer et vérifier.
+
+    Les écritures de préparation sont validées par ``with lr_conn:`` avant
+    l'appel testé ; les lectures de vérification voient ensuite les
+    modifications faites par la fonction testée sur sa propre connexion.
+
+    """
+    conn = sqlite3.connect(str(temp_lightroom_catalog))
+    yield conn
     conn.close()
 
-    yield catalog_path
 
-    catalog_path.unlink()
+@pytest.fixture
+def lightroom_catalog_memory(
+    lightroom_catalog_memory_template: sqlite3.Connection,
+) -> Generator[sqlite3.Connection, None, None]:
+    """Copie en mémoire le catalogue de test, pour les tests sans chemin.
+
+    Les fonctions qui reçoivent un curseur n'ont pas besoin d'un fichier :
+    la copie en mémoire évite toute écriture sur disque et disparaît avec
+    la connexion.
+
+    """
+    conn = sqlite3.connect(':memory:')
+    lightroom_catalog_memory_template.backup(conn)
+    yield conn
+    conn.close()
 
 
-def test_load_scan_photos(temp_scan_db: Path) -> None:
+def test_load_scan_photos(
+    scan_photos_by_filename: Dict[str, List[PhotoScan]],
+) -> None:
     """Test du chargement des photos depuis la base de scan."""
-    photos = load_scan_photos(temp_scan_db)
+    photos = scan_photos_by_filename
 
     assert len(photos) == 3
     assert 'photo1.jpg' in photos
@@ -160,9 +365,9 @@ def test_load_scan_photos(temp_scan_db: Path) -> None:
     assert photos['photo1.jpg'][0].nom_fichier == 'photo1.jpg'
 
 
-def test_load_lightroom_files(temp_lightroom_catalog: Path) -> None:
+def test_load_lightroom_files(lightroom_files: List[LightroomFile]) -> None:
     """Test du chargement des fichiers Lightroom."""
-    files = load_lightroom_files(temp_lightroom_catalog)
+    files = lightroom_files
 
     assert len(files) == 2
     assert files[0].id_local == 100
@@ -172,52 +377,99 @@ def test_load_lightroom_files(temp_lightroom_catalog: Path) -> None:
     assert files[0].old_absolute_path == 'G:/old/path/folder1/'
 
 
-def test_extract_path_components() -> None:
+def test_load_lightroom_files_null_columns(tmp_path: Path) -> None:
+    """Test des colonnes NULL : tous les chargeurs rendent des chaînes vides."""
+    catalog_path = tmp_path / 'nulls.lrcat'
+    conn = sqlite3.connect(str(catalog_path))
+    conn.executescript('''
+        CREATE TABLE AgLibraryRootFolder (
+            id_local INTEGER PRIMARY KEY, absolutePath TEXT
+        );
+        CREATE TABLE AgLibraryFolder (
+            id_local INTEGER PRIMARY KEY, pathFromRoot TEXT, rootFolder INTEGER
+        );
+        CREATE TABLE AgLibraryFile (
+            id_local INTEGER PRIMARY KEY, baseName TEXT, extension TEXT,
+            folder INTEGER
+        );
+        INSERT INTO AgLibraryRootFolder VALUES (1, NULL);
+        INSERT INTO AgLibraryFolder VALUES (10, NULL, 1);
+        INSERT INTO AgLibraryFile VALUES (100, 'photo1', NULL, 10);
+    ''')
+    conn.close()
+
+    files = load_lightroom_files(catalog_path)
+    assert files == [LightroomFile(
+        id_local=100,
+        base_name='photo1',
+        extension='',
+        folder_id=10,
+        root_folder_id=1,
+        old_absolute_path='',
+        path_from_root=''
+    )]
+
+    conn = sqlite3.connect(str(catalog_path))
+    try:
+        assert _load_files_by_root(conn.cursor(), [1]) == {1: files}
+    finally:
+        conn.close()
+
+
+@pytest.mark.parametrize('path, expected', [
+    ('test/folder1', ['test', 'folder1']),
+    ('G:/old/path/folder1/', ['G:', 'old', 'path', 'folder1']),
+    ('folder1', ['folder1']),
+    ('', []),
+    ('test\\folder1', ['test', 'folder1']),
+])
+def test_extract_path_components(path: str, expected: List[str]) -> None:
     """Test de l'extraction des composants de chemin."""
-    assert extract_path_components('test/folder1') == ['test', 'folder1']
-    assert extract_path_components('G:/old/path/folder1/') == ['G:', 'old', 'path', 'folder1']
-    assert extract_path_components('folder1') == ['folder1']
-    assert extract_path_components('') == []
-    assert extract_path_components('test\\folder1') == ['test', 'folder1']
+    assert extract_path_components(path) == expected
 
 
-def test_compare_paths() -> None:
-    """Test de la comparaison de chemins."""
+@pytest.mark.parametrize('old_path, new_path, expected', [
     # Correspondance exacte du dernier composant
-    assert compare_paths('G:/old/path/folder1/', 'test/folder1') == 0.8
-
+    ('G:/old/path/folder1/', 'test/folder1', 0.8),
     # Correspondance des 2 derniers composants
-    assert compare_paths('G:/old/path/folder1/', 'path/folder1') == 1.0
-
+    ('G:/old/path/folder1/', 'path/folder1', 1.0),
     # Pas de correspondance
-    assert compare_paths('G:/old/path/folder1/', 'test/folder2') == 0.0
-
+    ('G:/old/path/folder1/', 'test/folder2', 0.0),
     # Correspondance partielle
-    assert compare_paths('G:/old/path/folder1/', 'folder1/path') == 0.6
+    ('G:/old/path/folder1/', 'folder1/path', 0.6),
+])
+def test_compare_paths(old_path: str, new_path: str, expected: float) -> None:
+    """Test de la comparaison de chemins."""
+    assert compare_paths(old_path, new_path) == expected
 
 
-def test_verify_filename_match() -> None:
-    """Test de la vérification des noms de fichiers."""
+@pytest.mark.parametrize('base_name, extension, filename, expected', [
     # Correspondance exacte
-    assert verify_filename_match('photo1', 'jpg', 'photo1.jpg') is True
-
+    ('photo1', 'jpg', 'photo1.jpg', True),
     # Correspondance avec extension différente
-    assert verify_filename_match('photo1', 'jpg', 'photo1.png') is False
-
+    ('photo1', 'jpg', 'photo1.png', False),
     # Correspondance insensible à la casse
-    assert verify_filename_match('photo1', 'jpg', 'photo1.JPG') is True
-
+    ('photo1', 'jpg', 'photo1.JPG', True),
     # Pas de correspondance
-    assert verify_filename_match('photo1', 'jpg', 'photo2.jpg') is False
+    ('photo1', 'jpg', 'photo2.jpg', False),
+])
+def test_verify_filename_match(
+    base_name: str,
+    extension: str,
+    filename: str,
+    expected: bool,
+) -> None:
+    """Test de la vérification des noms de fichiers."""
+    assert verify_filename_match(base_name, extension, filename) is expected
 
 
 def test_find_matches(
-    temp_scan_db: Path,
-    temp_lightroom_catalog: Path,
+    scan_photos_by_filename: Dict[str, List[PhotoScan]],
+    lightroom_files: List[LightroomFile],
 ) -> None:
     """Test de la recherche de correspondances."""
-    photos = load_scan_photos(temp_scan_db)
-    files = load_lightroom_files(temp_lightroom_catalog)
+    photos = scan_photos_by_filename
+    files = lightroom_files
 
     matches = find_matches(files, photos, base_path=r'\\hal9001\Volume_1\photos')
 
@@ -229,28 +481,12 @@ def test_find_matches(
 
 def test_update_root_folders(
     temp_lightroom_catalog: Path,
+    lr_conn: sqlite3.Connection,
 ) -> None:
     """Test de la mise à jour des répertoires racine."""
-    matches = [
-        MatchResult(
-            lightroom_file=LightroomFile(
-                id_local=100,
-                base_name='photo1',
-                extension='jpg',
-                folder_id=10,
-                root_folder_id=1,
-                old_absolute_path='G:/old/path/folder1/',
-                path_from_root=''
-            ),
-            photo_scan=PhotoScan(
-                id=1,
-                repertoire='test/folder1',
-                nom_fichier='photo1.jpg'
-            ),
-            new_absolute_path=r'\\hal9001\Volume_1\photos\test\folder1' + '\\',
-            confidence=0.8
-        )
-    ]
+    matches = [_make_match()]
+    # data_version change dès qu'une autre connexion valide une écriture
+    data_version = lr_conn.execute('PRAGMA data_version').fetchone()[0]
 
     # Test en mode dry-run avec min_matches=1 (pour que le test passe)
     stats = update_root_folders(
@@ -262,15 +498,12 @@ def test_update_root_folders(
     assert stats['updated'] == 1
     assert stats.get('conflicts', 0) == 0
 
-    # Vérifier que rien n'a été modifié en dry-run
-    conn = sqlite3.connect(str(temp_lightroom_catalog))
-    cursor = conn.cursor()
-    cursor.execute(
+    # Vérifier que rien n'a été écrit en dry-run
+    assert lr_conn.execute('PRAGMA data_version').fetchone()[0] == data_version
+    cursor = lr_conn.execute(
         'SELECT absolutePath FROM AgLibraryRootFolder WHERE id_local = 1'
     )
-    result = cursor.fetchone()
-    assert result[0] == 'G:/old/path/folder1/'
-    conn.close()
+    assert cursor.fetchone()[0] == 'G:/old/path/folder1/'
 
     # Test avec modification réelle avec min_matches=1 (pour que le test passe)
     stats = update_root_folders(
@@ -283,45 +516,40 @@ def test_update_root_folders(
     assert stats.get('conflicts', 0) == 0
 
     # Vérifier la modification
-    conn = sqlite3.connect(str(temp_lightroom_catalog))
-    cursor = conn.cursor()
-    cursor.execute(
+    assert lr_conn.execute('PRAGMA data_version').fetchone()[0] != data_version
+    cursor = lr_conn.execute(
         'SELECT absolutePath FROM AgLibraryRootFolder WHERE id_local = 1'
     )
-    result = cursor.fetchone()
-    assert r'hal9001' in result[0]
-    conn.close()
+    assert r'hal9001' in cursor.fetchone()[0]
 
 
-def test_compare_paths_empty_components() -> None:
-    """Test de compare_paths avec composants vides."""
+@pytest.mark.parametrize('old_path, new_path', [
     # Cas où old_components est vide
-    assert compare_paths('', 'test/folder1') == 0.0
+    ('', 'test/folder1'),
     # Cas où new_components est vide
-    assert compare_paths('G:/old/path/folder1/', '') == 0.0
+    ('G:/old/path/folder1/', ''),
     # Cas où les deux sont vides
-    assert compare_paths('', '') == 0.0
+    ('', ''),
+])
+def test_compare_paths_empty_components(old_path: str, new_path: str) -> None:
+    """Test de compare_paths avec composants vides."""
+    assert compare_paths(old_path, new_path) == 0.0
 
 
-def test_compare_paths_single_component() -> None:
-    """Test de compare_paths avec un seul composant."""
+@pytest.mark.parametrize('new_path, expected', [
     # Un seul composant dans les deux
-    assert compare_paths('folder1', 'folder1') == 0.8
+    ('folder1', 0.8),
     # Un seul composant, pas de correspondance
-    assert compare_paths('folder1', 'folder2') == 0.0
+    ('folder2', 0.0),
+])
+def test_compare_paths_single_component(new_path: str, expected: float) -> None:
+    """Test de compare_paths avec un seul composant."""
+    assert compare_paths('folder1', new_path) == expected
 
 
 def test_find_best_match_for_file_no_match() -> None:
     """Test de _find_best_match_for_file sans correspondance."""
-    lr_file = LightroomFile(
-        id_local=100,
-        base_name='photo1',
-        extension='jpg',
-        folder_id=10,
-        root_folder_id=1,
-        old_absolute_path='G:/old/path/folder1/',
-        path_from_root=''
-    )
+    lr_file = _make_lightroom_file()
     candidates = [
         PhotoScan(id=1, repertoire='test/folder1', nom_fichier='photo2.jpg')
     ]
@@ -335,15 +563,7 @@ def test_find_best_match_for_file_no_match() -> None:
 
 def test_find_best_match_for_file_low_score() -> None:
     """Test de _find_best_match_for_file avec score trop bas."""
-    lr_file = LightroomFile(
-        id_local=100,
-        base_name='photo1',
-        extension='jpg',
-        folder_id=10,
-        root_folder_id=1,
-        old_absolute_path='G:/old/path/folder1/',
-        path_from_root=''
-    )
+    lr_file = _make_lightroom_file()
     candidates = [
         PhotoScan(id=1, repertoire='test/folder2', nom_fichier='photo1.jpg')
     ]
@@ -357,13 +577,13 @@ def test_find_best_match_for_file_low_score() -> None:
 
 
 def test_find_matches_with_none_base_path(
-    temp_scan_db: Path,
-    temp_lightroom_catalog: Path,
+    scan_photos_by_filename: Dict[str, List[PhotoScan]],
+    lightroom_files: List[LightroomFile],
     monkeypatch: pytest.MonkeyPatch,
 ) -> None:
     """Test de find_matches avec base_path=None."""
-    photos = load_scan_photos(temp_scan_db)
-    files = load_lightroom_files(temp_lightroom_catalog)
+    photos = scan_photos_by_filename
+    files = lightroom_files
     
     # Mock _load_photos_directory pour retourner un chemin
     monkeypatch.setattr(
@@ -376,95 +596,65 @@ def test_find_matches_with_none_base_path(
 
 
 def test_find_matches_filename_not_found(
-    temp_lightroom_catalog: Path,
+    lightroom_files: List[LightroomFile],
 ) -> None:
     """Test de find_matches quand le filename n'est pas trouvé."""
-    files = load_lightroom_files(temp_lightroom_catalog)
+    files = lightroom_files
     photos_by_filename: Dict[str, List[PhotoScan]] = {}
     
     matches = find_matches(files, photos_by_filename, base_path=r'\\hal9001\Volume_1\photos')
     assert len(matches) == 0
 
 
-def test_normalize_path_for_comparison() -> None:
-    """Test de _normalize_path_for_comparison."""
+@pytest.mark.parametrize('path, expected', [
     # Chemin vide
-    assert _normalize_path_for_comparison('') == ''
-    
+    ('', ''),
     # Chemin avec backslash
-    assert _normalize_path_for_comparison('G:\\old\\path\\folder1') == 'g:/old/path/folder1/'
-    
+    ('G:\\old\\path\\folder1', 'g:/old/path/folder1/'),
     # Chemin avec slash final
-    assert _normalize_path_for_comparison('G:/old/path/folder1/') == 'g:/old/path/folder1/'
-    
+    ('G:/old/path/folder1/', 'g:/old/path/folder1/'),
     # Chemin sans slash final
-    assert _normalize_path_for_comparison('G:/old/path/folder1') == 'g:/old/path/folder1/'
+    ('G:/old/path/folder1', 'g:/old/path/folder1/'),
+])
+def test_normalize_path_for_comparison(path: str, expected: str) -> None:
+    """Test de _normalize_path_for_comparison."""
+    assert _normalize_path_for_comparison(path) == expected
 
 
-def test_update_root_folders_empty_matches() -> None:
+def test_update_root_folders_empty_matches(tmp_path: Path) -> None:
     """Test de update_root_folders avec matches vide."""
-    catalog_file = tempfile.NamedTemporaryFile(
-        delete=False,
-        suffix='.lrcat'
-    )
-    catalog_path = Path(catalog_file.name)
-    catalog_file.close()
+    catalog_path = tmp_path / 'empty.lrcat'
+    conn = sqlite3.connect(str(catalog_path))
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE TABLE AgLibraryRootFolder (
+            id_local INTEGER PRIMARY KEY,
+            absolutePath TEXT NOT NULL
+        )
+    ''')
+    conn.commit()
+    conn.close()
     
-    try:
-        conn = sqlite3.connect(str(catalog_path))
-        cursor = conn.cursor()
-        cursor.execute('''
-            CREATE TABLE AgLibraryRootFolder (
-                id_local INTEGER PRIMARY KEY,
-                absolutePath TEXT NOT NULL
-            )
-        ''')
-        conn.commit()
-        conn.close()
-        
-        stats = update_root_folders(catalog_path, [], dry_run=False)
-        assert stats['updated'] == 0
-        assert stats['skipped'] == 0
-        assert stats['conflicts'] == 0
-        assert stats.get('rejected', 0) == 0
-    finally:
-        catalog_path.unlink()
+    stats = update_root_folders(catalog_path, [], dry_run=False)
+    assert stats['updated'] == 0
+    assert stats['skipped'] == 0
+    assert stats['conflicts'] == 0
+    assert stats.get('rejected', 0) == 0
 
 
 def test_update_root_folders_with_conflict(
     temp_lightroom_catalog: Path,
+    lr_conn: sqlite3.Connection,
 ) -> None:
     """Test de update_root_folders avec conflit."""
     # Créer un root_folder avec le même chemin que celui qu'on veut mettre à jour
-    conn = sqlite3.connect(str(temp_lightroom_catalog))
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT INTO AgLibraryRootFolder (id_local, id_global, absolutePath, name)
-        VALUES (3, 'guid3', ?, 'folder3')
-    ''', (r'\\hal9001\Volume_1\photos\test\folder1' + '\\',))
-    conn.commit()
-    conn.close()
+    with lr_conn:
+        lr_conn.execute('''
+            INSERT INTO AgLibraryRootFolder (id_local, id_global, absolutePath, name)
+            VALUES (3, 'guid3', ?, 'folder3')
+        ''', (_new_root_path('folder1'),))
     
-    matches = [
-        MatchResult(
-            lightroom_file=LightroomFile(
-                id_local=100,
-                base_name='photo1',
-                extension='jpg',
-                folder_id=10,
-                root_folder_id=1,
-                old_absolute_path='G:/old/path/folder1/',
-                path_from_root=''
-            ),
-            photo_scan=PhotoScan(
-                id=1,
-                repertoire='test/folder1',
-                nom_fichier='photo1.jpg'
-            ),
-            new_absolute_path=r'\\hal9001\Volume_1\photos\test\folder1' + '\\',
-            confidence=0.8
-        )
-    ]
+    matches = [_make_match()]
     
     stats = update_root_folders(
         temp_lightroom_catalog,
@@ -478,39 +668,17 @@ def test_update_root_folders_with_conflict(
 
 def test_update_root_folders_already_up_to_date(
     temp_lightroom_catalog: Path,
+    lr_conn: sqlite3.Connection,
 ) -> None:
     """Test de update_root_folders quand le chemin est déjà à jour."""
     # Mettre à jour le root_folder avec le nouveau chemin
-    conn = sqlite3.connect(str(temp_lightroom_catalog))
-    cursor = conn.cursor()
-    new_path = r'\\hal9001\Volume_1\photos\test\folder1' + '\\'
-    cursor.execute(
-        'UPDATE AgLibraryRootFolder SET absolutePath = ? WHERE id_local = 1',
-        (new_path,)
-    )
-    conn.commit()
-    conn.close()
-    
-    matches = [
-        MatchResult(
-            lightroom_file=LightroomFile(
-                id_local=100,
-                base_name='photo1',
-                extension='jpg',
-                folder_id=10,
-                root_folder_id=1,
-                old_absolute_path='G:/old/path/folder1/',
-                path_from_root=''
-            ),
-            photo_scan=PhotoScan(
-                id=1,
-                repertoire='test/folder1',
-                nom_fichier='photo1.jpg'
-            ),
-            new_absolute_path=new_path,
-            confidence=0.8
+    with lr_conn:
+        lr_conn.execute(
+            'UPDATE AgLibraryRootFolder SET absolutePath = ? WHERE id_local = 1',
+            (_new_root_path('folder1'),)
         )
-    ]
+    
+    matches = [_make_match()]
     
     stats = update_root_folders(
         temp_lightroom_catalog,
@@ -526,48 +694,9 @@ def test_update_root_folders_already_up_to_date(
 def test_group_matches_by_root() -> None:
     """Test de _group_matches_by_root."""
     matches = [
-        MatchResult(
-            lightroom_file=LightroomFile(
-                id_local=100,
-                base_name='photo1',
-                extension='jpg',
-                folder_id=10,
-                root_folder_id=1,
-                old_absolute_path='G:/old/path/folder1/',
-                path_from_root=''
-            ),
-            photo_scan=PhotoScan(id=1, repertoire='test/folder1', nom_fichier='photo1.jpg'),
-            new_absolute_path=r'\\hal9001\Volume_1\photos\test\folder1' + '\\',
-            confidence=0.8
-        ),
-        MatchResult(
-            lightroom_file=LightroomFile(
-                id_local=200,
-                base_name='photo2',
-                extension='jpg',
-                folder_id=20,
-                root_folder_id=2,
-                old_absolute_path='G:/old/path/folder2/',
-                path_from_root=''
-            ),
-            photo_scan=PhotoScan(id=2, repertoire='test/folder2', nom_fichier='photo2.jpg'),
-            new_absolute_path=r'\\hal9001\Volume_1\photos\test\folder2' + '\\',
-            confidence=0.8
-        ),
-        MatchResult(
-            lightroom_file=LightroomFile(
-                id_local=300,
-                base_name='photo3',
-                extension='jpg',
-                folder_id=10,
-                root_folder_id=1,
-                old_absolute_path='G:/old/path/folder1/',
-                path_from_root=''
-            ),
-            photo_scan=PhotoScan(id=3, repertoire='test/folder1', nom_fichier='photo3.jpg'),
-            new_absolute_path=r'\\hal9001\Volume_1\photos\test\folder1' + '\\',
-            confidence=0.8
-        ),
+        _make_match(),
+        _make_match(id_local=200, base_name='photo2', root_folder_id=2, scan_id=2),
+        _make_match(id_local=300, base_name='photo3', scan_id=3),
     ]
     
     updates_by_root, match_counts = _group_matches_by_root(matches)
@@ -575,7 +704,7 @@ def test_group_matches_by_root() -> None:
     assert 1 in updates_by_root
     assert 2 in updates_by_root
     # Le root_folder_id=1 devrait avoir le chemin du premier match
-    assert updates_by_root[1] == r'\\hal9001\Volume_1\photos\test\folder1' + '\\'
+    assert updates_by_root[1] == _new_root_path('folder1')
     # Vérifier les compteurs
     assert match_counts[1] == 2  # 2 matches pour root_folder_id=1
     assert match_counts[2] == 1  # 1 match pour root_folder_id=2
@@ -592,141 +721,434 @@ def test_build_new_path() -> None:
     assert 'test/folder1' in result
 
 
-def test_load_dry_run_mode(monkeypatch: pytest.MonkeyPatch) -> None:
+@pytest.fixture
+def env(monkeypatch: pytest.MonkeyPatch) -> pytest.MonkeyPatch:
+    """Fournit monkeypatch après le chargement du fichier .env.
+
+    Le fichier .env est lu une fois pour toutes avant que le test ne règle
+    les variables : il ne peut plus les écraser ni les recréer ensuite.
+
+    """
+    _ensure_dotenv_loaded()
+    return monkeypatch
+
+
+def test_load_dry_run_mode(env: pytest.MonkeyPatch) -> None:
     """Test de _load_dry_run_mode."""
-    from update_lightroom_paths import _load_dry_run_mode
-    from unittest.mock import patch
-    
     # Test avec DRY_RUN_MODE=true
-    with patch('update_lightroom_paths.os.getenv', return_value='true'):
-        assert _load_dry_run_mode() is True
+    env.setenv('DRY_RUN_MODE', 'true')
+    assert _load_dry_run_mode() is True
     
     # Test avec DRY_RUN_MODE=false
-    with patch('update_lightroom_paths.os.getenv', return_value='false'):
-        assert _load_dry_run_mode() is False
+    env.setenv('DRY_RUN_MODE', 'false')
+    assert _load_dry_run_mode() is False
     
     # Test avec DRY_RUN_MODE=1
-    with patch('update_lightroom_paths.os.getenv', return_value='1'):
-        assert _load_dry_run_mode() is True
+    env.setenv('DRY_RUN_MODE', '1')
+    assert _load_dry_run_mode() is True
     
     # Test avec valeur par défaut
-    with patch('update_lightroom_paths.os.getenv', return_value=None) as mock_getenv:
-        mock_getenv.side_effect = lambda key, default=None: default if key == 'DRY_RUN_MODE' else None
-        assert _load_dry_run_mode() is True
+    env.delenv('DRY_RUN_MODE', raising=False)
+    assert _load_dry_run_mode() is True
 
 
-def test_load_photos_directory(monkeypatch: pytest.MonkeyPatch) -> None:
+def test_load_photos_directory(env: pytest.MonkeyPatch) -> None:
     """Test de _load_photos_directory."""
-    from update_lightroom_paths import _load_photos_directory
-    from unittest.mock import patch
-    
     # Test avec variable d'environnement
     test_path = r'\\test\photos'
-    with patch('update_lightroom_paths.os.getenv', return_value=test_path):
-        assert _load_photos_directory() == test_path
+    env.setenv('PHOTOS_DIRECTORY', test_path)
+    assert _load_photos_directory() == test_path
     
     # Test avec valeur par défaut
-    with patch('update_lightroom_paths.os.getenv', return_value=None) as mock_getenv:
-        mock_getenv.side_effect = lambda key, default=None: default if key == 'PHOTOS_DIRECTORY' else None
-        assert _load_photos_directory() == r'\\hal9001\Volume_1\photos'
+    env.delenv('PHOTOS_DIRECTORY', raising=False)
+    assert _load_photos_directory() == r'\\hal9001\Volume_1\photos'
 
 
-def test_load_scan_db_filename(monkeypatch: pytest.MonkeyPatch) -> None:
+def test_load_scan_db_filename(env: pytest.MonkeyPatch) -> None:
     """Test de _load_scan_db_filename."""
-    from update_lightroom_paths import _load_scan_db_filename
-    from unittest.mock import patch
-    
     # Test avec variable d'environnement
     test_filename = 'test_scan.db'
-    with patch('update_lightroom_paths.os.getenv', return_value=test_filename):
-        assert _load_scan_db_filename() == test_filename
+    env.setenv('SCAN_DB_FILENAME', test_filename)
+    assert _load_scan_db_filename() == test_filename
     
     # Test avec valeur par défaut
-    with patch('update_lightroom_paths.os.getenv', return_value=None) as mock_getenv:
-        mock_getenv.side_effect = lambda key, default=None: default if key == 'SCAN_DB_FILENAME' else None
-        assert _load_scan_db_filename() == 'photos_scan_20251107_192045.db'
+    env.delenv('SCAN_DB_FILENAME', raising=False)
+    assert _load_scan_db_filename() == 'photos_scan_20251107_192045.db'
 
 
-def test_load_catalog_filename(monkeypatch: pytest.MonkeyPatch) -> None:
+def test_load_catalog_filename(env: pytest.MonkeyPatch) -> None:
     """Test de _load_catalog_filename."""
-    from update_lightroom_paths import _load_catalog_filename
-    from unittest.mock import patch
-    
     # Test avec variable d'environnement
     test_filename = 'test_catalog.lrcat'
-    with patch('update_lightroom_paths.os.getenv', return_value=test_filename):
-        assert _load_catalog_filename() == test_filename
+    env.setenv('CATALOG_FILENAME', test_filename)
+    assert _load_catalog_filename() == test_filename
     
     # Test avec valeur par défaut
-    with patch('update_lightroom_paths.os.getenv', return_value=None) as mock_getenv:
-        mock_getenv.side_effect = lambda key, default=None: default if key == 'CATALOG_FILENAME' else None
-        assert _load_catalog_filename() == 'catalogue 2 - dès juin 2017-2-2-v12.lrcat'
+    env.delenv('CATALOG_FILENAME', raising=False)
+    assert _load_catalog_filename() == 'catalogue 2 - dès juin 2017-2-2-v12.lrcat'
 
 
+def test_dotenv_loaded_once(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test que le fichier .env n'est lu qu'une fois pour tous les getters."""
+    calls: List[Tuple[object, ...]] = []
+    monkeypatch.setattr(
+        'update_lightroom_paths.load_dotenv',
+        lambda *args, **kwargs: calls.append(args)
+    )
+
+    monkeypatch.setattr('update_lightroom_paths._DOTENV_LOADED', False)
+
+    _load_dry_run_mode()
+    _load_photos_directory()
+    _load_scan_db_filename()
+    _load_catalog_filename()
+    _load_photos_directory()
+    assert len(calls) == 1
+
+
+# Seulement 3 matches pour les 5 fichiers du root_folder_id=1 (construits une
+# fois à l'import, update_root_folders ne modifie pas les correspondances)
+_REJECTION_MATCHES = tuple(
+    _make_match(id_local=100 + i, base_name=f'photo{i+1}', scan_id=i + 1)
+    for i in range(3)
+)
+
+
+@pytest.mark.parametrize('min_matches, expected', [
+    # Le root_folder a 5 fichiers, mais seulement 3 matches : rejeté
+    (5, {'rejected': 1, 'updated': 0, 'skipped': 0, 'conflicts': 0}),
+    # Accepté car 3 matches >= 2
+    (2, {'rejected': 0, 'updated': 1}),
+])
 def test_update_root_folders_min_matches_rejection(
     temp_lightroom_catalog: Path,
+    lr_conn: sqlite3.Connection,
+    min_matches: int,
+    expected: Dict[str, int],
 ) -> None:
-    """Test de update_root_folders avec rejet si moins de 5 matches."""
-    # Ajouter 5 fichiers dans root_folder_id=1 pour le test
-    conn = sqlite3.connect(str(temp_lightroom_catalog))
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        INSERT INTO AgLibraryFile (id_local, id_global, baseName, extension, folder, idx_filename, lc_idx_filename, lc_idx_filenameExtension, originalFilename)
-        VALUES
-            (101, 'guid101', 'photo2', 'jpg', 10, 'photo2.jpg', 'photo2.jpg', 'photo2.jpg', 'photo2.jpg'),
-            (102, 'guid102', 'photo3', 'jpg', 10, 'photo3.jpg', 'photo3.jpg', 'photo3.jpg', 'photo3.jpg'),
-            (103, 'guid103', 'photo4', 'jpg', 10, 'photo4.jpg', 'photo4.jpg', 'photo4.jpg', 'photo4.jpg'),
-            (104, 'guid104', 'photo5', 'jpg', 10, 'photo5.jpg', 'photo5.jpg', 'photo5.jpg', 'photo5.jpg')
-    ''')
-    
-    conn.commit()
-    conn.close()
-    
-    # Créer seulement 3 matches pour root_folder_id=1 (moins que le minimum de 5)
-    # Le root_folder a 5 fichiers, mais seulement 3 matches, donc il sera rejeté
-    matches = [
-        MatchResult(
-            lightroom_file=LightroomFile(
-                id_local=100 + i,
-                base_name=f'photo{i+1}',
-                extension='jpg',
-                folder_id=10,
-                root_folder_id=1,
-                old_absolute_path='G:/old/path/folder1/',
-                path_from_root=''
-            ),
-            photo_scan=PhotoScan(
-                id=i+1,
-                repertoire='test/folder1',
-                nom_fichier=f'photo{i+1}.jpg'
-            ),
-            new_absolute_path=r'\\hal9001\Volume_1\photos\test\folder1' + '\\',
-            confidence=0.8
-        )
-        for i in range(3)  # Seulement 3 matches sur 5 fichiers
-    ]
-    
-    # Test avec min_matches=5 (par défaut)
-    # Le root_folder a 5 fichiers, mais seulement 3 matches, donc il sera rejeté
+    """Test de update_root_folders avec rejet si moins de min_matches matches."""
+    # Le root_folder_id=1 passe à 5 fichiers, dont seulement 3 ont un match
+    with lr_conn:
+        lr_conn.executemany(_INSERT_LIBRARY_FILE, [
+            _library_file_row(100 + i, f'photo{i+1}', 'jpg', 10)
+            for i in range(1, 5)
+        ])
+
+    stats = update_root_folders(
+        temp_lightroom_catalog,
+        list(_REJECTION_MATCHES),
+        dry_run=False,
+        min_matches=min_matches
+    )
+    for key, value in expected.items():
+        assert stats[key] == value, key
+
+
+def test_update_root_folders_filename_only_fallback(
+    scan_photos_by_filename: Dict[str, List[PhotoScan]],
+    temp_lightroom_catalog: Path,
+    lr_conn: sqlite3.Connection,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test de la recherche par nom pour les root_folders sans matches."""
+    monkeypatch.setattr(
+        'update_lightroom_paths._load_photos_directory',
+        lambda: r'\\hal9001\Volume_1\photos'
+    )
+    # Seul le root_folder_id=1 a un match, le root_folder_id=2 passe
+    # par la recherche par nom de fichier
+    matches = [_make_match()]
+
     stats = update_root_folders(
         temp_lightroom_catalog,
         matches,
         dry_run=False,
-        min_matches=5
+        min_matches=1,
+        photos_by_filename=scan_photos_by_filename,
+        photos_base_path=r'\\hal9001\Volume_1\photos'
     )
-    assert stats['rejected'] == 1
-    assert stats['updated'] == 0
-    assert stats['skipped'] == 0
-    assert stats['conflicts'] == 0
-    
-    # Test avec min_matches=2 (devrait passer car 3 matches >= 2)
+    assert stats['updated'] == 2
+    assert stats['no_matches'] == 0
+
+    cursor = lr_conn.execute(
+        'SELECT absolutePath FROM AgLibraryRootFolder WHERE id_local = 2'
+    )
+    assert cursor.fetchone()[0].endswith('test/folder2/')
+
+
+def test_root_folder_index(
+    lightroom_catalog_memory: sqlite3.Connection,
+) -> None:
+    """Test du chargement et de la mise à jour de l'index des root_folders."""
+    root_index = _load_root_folder_index(lightroom_catalog_memory.cursor())
+
+    assert root_index.paths_by_id == {
+        1: 'G:/old/path/folder1/',
+        2: 'G:/old/path/folder2/'
+    }
+    assert root_index.ids_by_path['G:/old/path/folder1/'] == [1]
+
+    _set_root_folder_path(root_index, 1, 'G:/new/folder1/')
+    assert root_index.paths_by_id[1] == 'G:/new/folder1/'
+    assert root_index.ids_by_path['G:/new/folder1/'] == [1]
+    assert 'G:/old/path/folder1/' not in root_index.ids_by_path
+
+
+def test_count_files_by_root(
+    lightroom_catalog_memory: sqlite3.Connection,
+) -> None:
+    """Test du comptage groupé des fichiers par root_folder."""
+    counts = _count_files_by_root(lightroom_catalog_memory.cursor(), [1, 2, 99])
+
+    # Un root_folder sans fichier (ou inconnu) compte 0
+    assert counts == {1: 1, 2: 1, 99: 0}
+
+
+def test_escape_like() -> None:
+    """Test de l'échappement des jokers LIKE."""
+    assert _escape_like('//hal9001/Volume_1/photos') == '//hal9001/Volume\\_1/photos'
+    assert _escape_like('100%') == '100\\%'
+
+
+def test_find_root_folders_without_matches_literal_prefix(
+    lightroom_catalog_memory: sqlite3.Connection,
+) -> None:
+    """Test que le '_' du chemin de base n'est pas traité comme un joker."""
+    cursor = lightroom_catalog_memory.cursor()
+    cursor.execute(
+        'UPDATE AgLibraryRootFolder SET absolutePath = ? WHERE id_local = 1',
+        ('//hal9001/Volume_1/photos/test/folder1/',)
+    )
+    cursor.execute(
+        'UPDATE AgLibraryRootFolder SET absolutePath = ? WHERE id_local = 2',
+        ('//hal9001/VolumeX1/photos/test/folder2/',)
+    )
+
+    root_ids = _find_root_folders_without_matches(
+        cursor,
+        set(),
+        '//hal9001/Volume_1/photos'
+    )
+    assert root_ids == [2]
+
+
+def test_update_root_folders_merges_into_existing_root(
+    temp_lightroom_catalog: Path,
+    lr_conn: sqlite3.Connection,
+) -> None:
+    """Test de la fusion vers un root_folder qui a déjà le nouveau chemin."""
+    new_path = _new_root_path('folder1')
+    with lr_conn:
+        lr_conn.execute('''
+            INSERT INTO AgLibraryRootFolder (id_local, id_global, absolutePath, name)
+            VALUES (3, 'guid3', ?, 'folder3')
+        ''', (new_path,))
+        lr_conn.execute('''
+            INSERT INTO AgLibraryFolder (id_local, id_global, pathFromRoot, rootFolder)
+            VALUES (30, 'guid30', '', 3)
+        ''')
+
+    matches = [_make_match()]
+    data_version = lr_conn.execute('PRAGMA data_version').fetchone()[0]
+
+    stats = update_root_folders(
+        temp_lightroom_catalog,
+        matches,
+        dry_run=True,
+        min_matches=1
+    )
+    assert stats['updated'] == 1
+    assert stats['merged'] == 1
+    # La fusion simulée n'écrit rien dans le catalogue
+    assert lr_conn.execute('PRAGMA data_version').fetchone()[0] == data_version
+
     stats = update_root_folders(
         temp_lightroom_catalog,
         matches,
         dry_run=False,
-        min_matches=2
+        min_matches=1
     )
-    assert stats['rejected'] == 0
     assert stats['updated'] == 1
+    assert stats['merged'] == 1
+    assert stats['conflicts'] == 0
+
+    cursor = lr_conn.execute(
+        'SELECT folder FROM AgLibraryFile WHERE id_local = 100'
+    )
+    assert cursor.fetchone()[0] == 30
+
+
+def test_update_root_folders_merge_skips_existing_file(
+    temp_lightroom_catalog: Path,
+    lr_conn: sqlite3.Connection,
+) -> None:
+    """Test que la fusion ignore les fichiers déjà présents dans la cible."""
+    new_path = _new_root_path('folder1')
+    with lr_conn:
+        lr_conn.execute('''
+            INSERT INTO AgLibraryRootFolder (id_local, id_global, absolutePath, name)
+            VALUES (3, 'guid3', ?, 'folder3')
+        ''', (new_path,))
+        lr_conn.execute('''
+            INSERT INTO AgLibraryFolder (id_local, id_global, pathFromRoot, rootFolder)
+            VALUES (30, 'guid30', '', 3)
+        ''')
+        lr_conn.execute(
+            _INSERT_LIBRARY_FILE, _library_file_row(300, 'photo1', 'jpg', 30)
+        )
+
+    matches = [_make_match()]
+
+    stats = update_root_folders(
+        temp_lightroom_catalog,
+        matches,
+        dry_run=False,
+        min_matches=1
+    )
+    assert stats['merged'] == 0
+    assert stats['conflicts'] == 1
+
+
+def test_merge_root_folders_null_filenames() -> None:
+    """Test que les fichiers sans lc_idx_filename sont tous fusionnés."""
+    conn = sqlite3.connect(':memory:')
+    conn.execute(
+        'CREATE TABLE AgLibraryFolder '
+        '(id_local INTEGER PRIMARY KEY, pathFromRoot TEXT, rootFolder INTEGER)'
+    )
+    conn.execute(
+        'CREATE TABLE AgLibraryFile '
+        '(id_local INTEGER PRIMARY KEY, folder INTEGER, lc_idx_filename TEXT)'
+    )
+    conn.executemany(
+        'INSERT INTO AgLibraryFolder VALUES (?, ?, ?)',
+        [(10, 'album/', 1), (20, 'album/', 2)]
+    )
+    # Deux fichiers sans nom, et deux du même nom (le second est un doublon)
+    conn.executemany(
+        'INSERT INTO AgLibraryFile VALUES (?, ?, ?)',
+        [(1, 10, None), (2, 10, None), (3, 10, 'a.jpg'), (4, 10, 'a.jpg')]
+    )
+    cursor = conn.cursor()
+
+    assert _merge_root_folders(cursor, 1, 2, dry_run=False) == 3
+    moved = cursor.execute(
+        'SELECT id_local FROM AgLibraryFile WHERE folder = 20 ORDER BY id_local'
+    ).fetchall()
+    assert moved == [(1,), (2,), (3,)]
+    conn.close()
+
+
+def test_process_root_folders_without_matches_reloads_merge_target(
+    scan_photos_by_filename: Dict[str, List[PhotoScan]],
+    lightroom_catalog_memory: sqlite3.Connection,
+) -> None:
+    """Test qu'un root_folder voit les fichiers fusionnés plus tôt dans la passe."""
+    cursor = lightroom_catalog_memory.cursor()
+    # Le root_folder 3 a déjà le chemin de folder1 construit par la recherche
+    # par nom, avec un fichier absent du scan
+    cursor.execute('''
+        INSERT INTO AgLibraryRootFolder (id_local, id_global, absolutePath, name)
+        VALUES (3, 'guid3', ?, 'folder3')
+    ''', ('//hal9001/Volume_1/photos/test/folder1/',))
+    cursor.execute('''
+        INSERT INTO AgLibraryFolder (id_local, id_global, pathFromRoot, rootFolder)
+        VALUES (30, 'guid30', '', 3)
+    ''')
+    cursor.execute(
+        _INSERT_LIBRARY_FILE, _library_file_row(300, 'other', 'jpg', 30)
+    )
+    root_index = _load_root_folder_index(cursor)
+
+    stats = _process_root_folders_without_matches(
+        cursor,
+        root_index,
+        [1, 3],
+        scan_photos_by_filename,
+        r'\\hal9001\Volume_1\photos',
+        min_matches=1,
+        dry_run=False
+    )
+
+    # photo1.jpg passe de 1 à 3, puis compte parmi les fichiers du
+    # root_folder 3, déjà au bon chemin
+    assert stats['merged'] == 1
+    assert stats['skipped'] == 1
+
+
+def test_connect_readonly(tmp_path: Path) -> None:
+    """Test de l'ouverture en lecture seule (chemin avec espaces et accents)."""
+    db_path = tmp_path / 'catalogue 2 - dès juin.lrcat'
+    conn = sqlite3.connect(str(db_path))
+    conn.execute('CREATE TABLE t (x INTEGER)')
+    conn.execute('INSERT INTO t VALUES (1)')
+    conn.commit()
+    conn.close()
+
+    conn = _connect_readonly(db_path)
+    try:
+        assert conn.execute('SELECT x FROM t').fetchone() == (1,)
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute('INSERT INTO t VALUES (2)')
+    finally:
+        conn.close()
+
+
+def test_load_scan_photos_uncheckpointed_wal(tmp_path: Path) -> None:
+    """Test que les photos encore dans le -wal d'un scan interrompu sont lues."""
+    writer_dir = tmp_path / 'writer'
+    writer_dir.mkdir()
+    db_path = writer_dir / 'scan.db'
+    writer = sqlite3.connect(str(db_path))
+    writer.execute('PRAGMA journal_mode=WAL')
+    writer.execute('PRAGMA wal_autocheckpoint=0')
+    with writer:
+        writer.execute('''
+            CREATE TABLE photos (
+                id INTEGER PRIMARY KEY,
+                repertoire TEXT NOT NULL,
+                nom_fichier TEXT NOT NULL,
+                hauteur INTEGER,
+                largeur INTEGER
+            )
+        ''')
+        writer.executemany(
+            'INSERT INTO photos (repertoire, nom_fichier, hauteur, largeur) '
+            'VALUES (?, ?, ?, ?)',
+            [('test', f'photo{i}.jpg', 1, 1) for i in range(500)]
+        )
 
+    # Copie prise avant toute fermeture du scan : comme après un arrêt
+    # brutal, le schéma et les lignes ne sont que dans le -wal
+    crashed_dir = tmp_path / 'crashed'
+    crashed_dir.mkdir()
+    for name in ('scan.db', 'scan.db-wal'):
+        shutil.copyfile(writer_dir / name, crashed_dir / name)
+    writer.close()
+
+    photos = load_scan_photos(crashed_dir / 'scan.db')
+    assert len(photos) == 500
+
+
+def test_update_root_folders_filename_only_not_in_scan(
+    temp_lightroom_catalog: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test d'un root_folder sans match dont aucun fichier n'est dans le scan."""
+    monkeypatch.setattr(
+        'update_lightroom_paths._load_photos_directory',
+        lambda: r'\\hal9001\Volume_1\photos'
+    )
+    matches = [_make_match()]
+    photo1 = matches[0].photo_scan
+
+    stats = update_root_folders(
+        temp_lightroom_catalog,
+        matches,
+        dry_run=True,
+        min_matches=1,
+        photos_by_filename={'photo1.jpg': [photo1]},
+        photos_base_path=r'\\hal9001\Volume_1\photos'
+    )
+    assert stats['updated'] == 1
+    assert stats['no_matches'] == 1
@@ -6,14 +6,31 @@ par les nouveaux répertoires basés sur les données du scan des photos.
 
 import sqlite3
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Set, Tuple
 from dataclasses import dataclass
 from collections import Counter
+from functools import lru_cache
+from urllib.parse import quote
 import os
+import sys
 from dotenv import load_dotenv
 
 
-@dataclass
+# Nombre maximum de paramètres par requête (limite historique de SQLite: 999)
+_SQLITE_MAX_VARIABLES = 900
+
+# Réglages de lecture propres à la connexion (jamais écrits dans le
+# fichier) : mmap de 1 Gio, cache de pages de 256 Mio et tables
+# temporaires en mémoire
+_CACHE_PRAGMAS = (
+    'mmap_size=1073741824',
+    'cache_size=-262144',
+    'temp_store=MEMORY',
+)
+_READONLY_PRAGMAS = _CACHE_PRAGMAS + ('query_only=1',)
+
+
+@dataclass(slots=True)
 class PhotoScan:
     """Représente une photo du scan avec ses informations."""
 
@@ -22,7 +39,7 @@ class PhotoScan:
     id: int
 
 
-@dataclass
+@dataclass(slots=True)
 class LightroomFile:
     """Représente un fichier dans le catalogue Lightroom."""
 
@@ -35,7 +52,7 @@ class LightroomFile:
     path_from_root: str
 
 
-@dataclass
+@dataclass(slots=True)
 class MatchResult:
     """Résultat de la correspondance entre un fichier Lightroom et un scan."""
 
@@ -45,6 +62,41 @@ class MatchResult:
     confidence: float
 
 
+@dataclass
+class RootFolderIndex:
+    """Index en mémoire de la table AgLibraryRootFolder."""
+
+    paths_by_id: Dict[int, str]
+    ids_by_path: Dict[str, List[int]]
+
+
+def _connect_readonly(db_path: Path) -> sqlite3.Connection:
+    """Ouvre une base SQLite en lecture seule avec des PRAGMAs de lecture.
+
+    La base n'est jamais déclarée immuable : un journal -wal non encore
+    reporté (scan interrompu avant son dernier checkpoint) doit être lu,
+    sans quoi des photos manqueraient en silence.
+
+    Args:
+        db_path: Chemin vers la base de données SQLite.
+
+    Returns:
+        Connexion SQLite en lecture seule.
+
+    """
+    posix_path = db_path.resolve().as_posix()
+    if posix_path.startswith('//'):
+        # Chemin UNC : SQLite attend file:////serveur/partage/...
+        posix_path = '//' + posix_path
+    conn = sqlite3.connect(
+        f"file:{quote(posix_path, safe='/:')}?mode=ro",
+        uri=True
+    )
+    for pragma in _READONLY_PRAGMAS:
+        conn.execute(f'PRAGMA {pragma}')
+    return conn
+
+
 def load_scan_photos(
     db_path: Path,
 ) -> Dict[str, List[PhotoScan]]:
@@ -57,17 +109,22 @@ def load_scan_photos(
         Dictionnaire indexé par nom de fichier contenant les photos.
 
     """
-    conn = sqlite3.connect(str(db_path))
+    conn = _connect_readonly(db_path)
     cursor = conn.cursor()
 
     cursor.execute(
         'SELECT id, repertoire, nom_fichier FROM photos'
     )
-    rows = cursor.fetchall()
 
+    # Itérer directement sur le curseur évite de matérialiser toutes
+    # les lignes en mémoire avant de construire le dictionnaire
     photos_by_filename: Dict[str, List[PhotoScan]] = {}
-    for row in rows:
+    for row in cursor:
         photo_id, repertoire, nom_fichier = row
+        # Les répertoires se répètent d'une photo à l'autre et les noms
+        # servent de clés : sys.intern partage une seule chaîne par valeur
+        repertoire = sys.intern(repertoire)
+        nom_fichier = sys.intern(nom_fichier)
         photo = PhotoScan(
             repertoire=repertoire,
             nom_fichier=nom_fichier,
@@ -81,6 +138,29 @@ def load_scan_photos(
     return photos_by_filename
 
 
+def _lightroom_file_from_row(row: Tuple[Any, ...]) -> LightroomFile:
+    """Construit un fichier Lightroom depuis une ligne du catalogue.
+
+    Args:
+        row: Ligne (id_local, baseName, extension, folder, rootFolder,
+            absolutePath, pathFromRoot).
+
+    Returns:
+        Fichier Lightroom, avec des chaînes vides à la place des NULL.
+
+    """
+    # Extensions et chemins sont partagés par de nombreux fichiers
+    return LightroomFile(
+        id_local=row[0],
+        base_name=row[1],
+        extension=sys.intern(row[2] or ''),
+        folder_id=row[3],
+        root_folder_id=row[4],
+        old_absolute_path=sys.intern(row[5] or ''),
+        path_from_root=sys.intern(row[6] or '')
+    )
+
+
 def load_lightroom_files(
     catalog_path: Path,
 ) -> List[LightroomFile]:
@@ -93,7 +173,7 @@ def load_lightroom_files(
         Liste des fichiers Lightroom avec leurs informations.
 
     """
-    conn = sqlite3.connect(str(catalog_path))
+    conn = _connect_readonly(catalog_path)
     cursor = conn.cursor()
 
     query = '''
@@ -110,20 +190,8 @@ def load_lightroom_files(
         JOIN AgLibraryRootFolder rf ON f.rootFolder = rf.id_local
     '''
     cursor.execute(query)
-    rows = cursor.fetchall()
-
-    files: List[LightroomFile] = []
-    for row in rows:
-        file_obj = LightroomFile(
-            id_local=row[0],
-            base_name=row[1],
-            extension=row[2],
-            folder_id=row[3],
-            root_folder_id=row[4],
-            old_absolute_path=row[5],
-            path_from_root=row[6]
-        )
-        files.append(file_obj)
+
+    files = [_lightroom_file_from_row(row) for row in cursor]
 
     conn.close()
     return files
@@ -148,47 +216,79 @@ def extract_path_components(path: str) -> List[str]:
     return components
 
 
-def compare_paths(
-    old_path: str,
-    new_repertoire: str,
+@lru_cache(maxsize=1 << 16)
+def _path_tokens(path: str) -> Tuple[str, ...]:
+    """Découpe un chemin en composants en minuscules (résultat mis en cache).
+
+    Les chemins se répètent beaucoup (un root_folder pour de nombreux
+    fichiers, un répertoire pour de nombreuses photos).
+
+    Args:
+        path: Chemin à découper.
+
+    Returns:
+        Tuple des composants du chemin, en minuscules.
+
+    """
+    return tuple(c.lower() for c in extract_path_components(path))
+
+
+def _compare_path_tokens(
+    old_components: Tuple[str, ...],
+    new_components: Tuple[str, ...],
 ) -> float:
-    """Compare deux chemins en se basant sur les 1-2 derniers composants.
+    """Compare deux chemins déjà découpés par _path_tokens.
 
     Args:
-        old_path: Ancien chemin absolu.
-        new_repertoire: Nouveau répertoire relatif.
+        old_components: Composants de l'ancien chemin absolu.
+        new_components: Composants du nouveau répertoire relatif.
 
     Returns:
         Score de correspondance entre 0.0 et 1.0.
 
     """
-    old_components = extract_path_components(old_path)
-    new_components = extract_path_components(new_repertoire)
-
     if not old_components or not new_components:
         return 0.0
 
     # Comparer les 1-2 derniers composants
-    old_last = old_components[-1].lower()
-    new_last = new_components[-1].lower()
+    old_last = old_components[-1]
+    new_last = new_components[-1]
 
     if old_last == new_last:
         if len(old_components) >= 2 and len(new_components) >= 2:
-            old_second = old_components[-2].lower()
-            new_second = new_components[-2].lower()
-            if old_second == new_second:
+            if old_components[-2] == new_components[-2]:
                 return 1.0
         return 0.8
 
     if len(old_components) >= 2 and len(new_components) >= 2:
-        old_second = old_components[-2].lower()
-        new_second = new_components[-2].lower()
+        old_second = old_components[-2]
+        new_second = new_components[-2]
         if old_second == new_last or old_last == new_second:
             return 0.6
 
     return 0.0
 
 
+def compare_paths(
+    old_path: str,
+    new_repertoire: str,
+) -> float:
+    """Compare deux chemins en se basant sur les 1-2 derniers composants.
+
+    Args:
+        old_path: Ancien chemin absolu.
+        new_repertoire: Nouveau répertoire relatif.
+
+    Returns:
+        Score de correspondance entre 0.0 et 1.0.
+
+    """
+    return _compare_path_tokens(
+        _path_tokens(old_path),
+        _path_tokens(new_repertoire)
+    )
+
+
 def verify_filename_match(
     lr_base_name: str,
     lr_extension: str,
@@ -254,17 +354,19 @@ def _find_best_match_for_file(
     best_match: Optional[MatchResult] = None
     best_score = 0.0
 
+    # Même règle que verify_filename_match, mais le nom Lightroom n'est
+    # construit qu'une fois pour tous les candidats
+    lr_full_name = f"{lr_file.base_name}.{lr_file.extension}".lower()
+    # L'ancien chemin est le même pour tous les candidats : le découper une fois
+    old_components = _path_tokens(lr_file.old_absolute_path)
+
     for photo in candidates:
-        if not verify_filename_match(
-            lr_file.base_name,
-            lr_file.extension,
-            photo.nom_fichier
-        ):
+        if photo.nom_fichier.lower() != lr_full_name:
             continue
 
-        score = compare_paths(
-            lr_file.old_absolute_path,
-            photo.repertoire
+        score = _compare_path_tokens(
+            old_components,
+            _path_tokens(photo.repertoire)
         )
 
         if score > best_score:
@@ -344,6 +446,37 @@ def _count_total_files_in_root_folder(
     return result[0] if result else 0
 
 
+def _count_files_by_root(
+    cursor: sqlite3.Cursor,
+    root_ids: List[int],
+) -> Dict[int, int]:
+    """Compte en une passe les fichiers de plusieurs root_folders.
+
+    Args:
+        cursor: Curseur de base de données.
+        root_ids: Liste des IDs de root_folders à compter.
+
+    Returns:
+        Dictionnaire root_id -> nombre total de fichiers (0 si vide).
+
+    """
+    counts: Dict[int, int] = {root_id: 0 for root_id in root_ids}
+
+    for start in range(0, len(root_ids), _SQLITE_MAX_VARIABLES):
+        chunk = root_ids[start:start + _SQLITE_MAX_VARIABLES]
+        placeholders = ', '.join('?' * len(chunk))
+        cursor.execute(f'''
+            SELECT f.rootFolder, COUNT(fl.id_local)
+            FROM AgLibraryFile fl
+            JOIN AgLibraryFolder f ON fl.folder = f.id_local
+            WHERE f.rootFolder IN ({placeholders})
+            GROUP BY f.rootFolder
+        ''', chunk)
+        counts.update(cursor.fetchall())
+
+    return counts
+
+
 def _group_matches_by_root(
     matches: List[MatchResult],
 ) -> Tuple[Dict[int, str], Dict[int, int]]:
@@ -366,8 +499,9 @@ def _group_matches_by_root(
     return updates_by_root, match_counts
 
 
+@lru_cache(maxsize=1 << 17)
 def _normalize_path_for_comparison(path: str) -> str:
-    """Normalise un chemin pour la comparaison.
+    """Normalise un chemin pour la comparaison (résultat mis en cache).
 
     Args:
         path: Chemin à normaliser.
@@ -405,80 +539,108 @@ def _merge_root_folders(
         Nombre de fichiers fusionnés.
 
     """
-    # Récupérer tous les fichiers du source avec leur dossier, pathFromRoot et lc_idx_filename
+    # Sélectionner en une requête les fichiers du source qui ont un dossier
+    # correspondant dans le target (même pathFromRoot) et aucun fichier de
+    # même lc_idx_filename déjà présent dans ce dossier
     cursor.execute('''
-        SELECT fl.id_local, fl.folder, f.pathFromRoot, fl.lc_idx_filename
-        FROM AgLibraryFile fl
-        JOIN AgLibraryFolder f ON fl.folder = f.id_local
-        WHERE f.rootFolder = ?
-    ''', (source_root_id,))
-    source_files = cursor.fetchall()
-    
-    if not source_files:
-        return 0
+        SELECT candidates.file_id, candidates.lc_idx_filename,
+               candidates.target_folder_id
+        FROM (
+            SELECT
+                fl.id_local AS file_id,
+                fl.lc_idx_filename AS lc_idx_filename,
+                (
+                    SELECT MIN(tf.id_local)
+                    FROM AgLibraryFolder tf
+                    WHERE tf.rootFolder = ? AND tf.pathFromRoot = f.pathFromRoot
+                ) AS target_folder_id
+            FROM AgLibraryFile fl
+            JOIN AgLibraryFolder f ON fl.folder = f.id_local
+            WHERE f.rootFolder = ?
+        ) candidates
+        WHERE candidates.target_folder_id IS NOT NULL
+          AND NOT EXISTS (
+              SELECT 1
+              FROM AgLibraryFile existing
+              WHERE existing.folder = candidates.target_folder_id
+                AND existing.lc_idx_filename = candidates.lc_idx_filename
+          )
+    ''', (target_root_id, source_root_id))
     
-    total_files_merged = 0
+    # Un seul fichier par (dossier cible, lc_idx_filename) : les suivants
+    # seraient des doublons du premier fichier fusionné. Un nom NULL n'est
+    # égal à aucun autre en SQL : ces fichiers sont tous fusionnés
+    seen: Set[Tuple[int, str]] = set()
+    files_to_merge: List[Tuple[int, int]] = []
+    for file_id, lc_idx_filename, target_folder_id in cursor.fetchall():
+        if lc_idx_filename is not None:
+            key = (target_folder_id, lc_idx_filename)
+            if key in seen:
+                continue
+            seen.add(key)
+        files_to_merge.append((target_folder_id, file_id))
     
-    if not dry_run:
-        for file_id, source_folder_id, path_from_root, lc_idx_filename in source_files:
-            # Trouver le dossier correspondant dans le target (même pathFromRoot)
-            cursor.execute('''
-                SELECT id_local
-                FROM AgLibraryFolder
-                WHERE rootFolder = ? AND pathFromRoot = ?
-            ''', (target_root_id, path_from_root))
-            target_folder = cursor.fetchone()
-            
-            if target_folder:
-                target_folder_id = target_folder[0]
-                
-                # Vérifier si un fichier avec le même lc_idx_filename existe déjà dans le dossier cible
-                cursor.execute('''
-                    SELECT id_local
-                    FROM AgLibraryFile
-                    WHERE folder = ? AND lc_idx_filename = ?
-                ''', (target_folder_id, lc_idx_filename))
-                existing_file = cursor.fetchone()
-                
-                if not existing_file:
-                    # Le fichier n'existe pas dans le dossier cible, on peut le fusionner
-                    cursor.execute('''
-                        UPDATE AgLibraryFile
-                        SET folder = ?
-                        WHERE id_local = ?
-                    ''', (target_folder_id, file_id))
-                    total_files_merged += 1
-                # Si le fichier existe déjà, on ignore (doublon)
-            # Si le dossier n'existe pas dans le target, on ignore le fichier
-    else:
-        # Mode dry_run : compter seulement les fichiers qui peuvent être fusionnés
-        for file_id, source_folder_id, path_from_root, lc_idx_filename in source_files:
-            cursor.execute('''
-                SELECT id_local
-                FROM AgLibraryFolder
-                WHERE rootFolder = ? AND pathFromRoot = ?
-            ''', (target_root_id, path_from_root))
-            target_folder = cursor.fetchone()
-            
-            if target_folder:
-                target_folder_id = target_folder[0]
-                
-                # Vérifier si un fichier avec le même lc_idx_filename existe déjà
-                cursor.execute('''
-                    SELECT id_local
-                    FROM AgLibraryFile
-                    WHERE folder = ? AND lc_idx_filename = ?
-                ''', (target_folder_id, lc_idx_filename))
-                existing_file = cursor.fetchone()
-                
-                if not existing_file:
-                    total_files_merged += 1
+    if files_to_merge and not dry_run:
+        cursor.executemany('''
+            UPDATE AgLibraryFile
+            SET folder = ?
+            WHERE id_local = ?
+        ''', files_to_merge)
     
-    return total_files_merged
+    return len(files_to_merge)
+
+
+def _load_root_folder_index(
+    cursor: sqlite3.Cursor,
+) -> RootFolderIndex:
+    """Charge la table AgLibraryRootFolder en mémoire.
+
+    Args:
+        cursor: Curseur de base de données.
+
+    Returns:
+        Index des chemins par ID et des IDs par chemin.
+
+    """
+    cursor.execute(
+        'SELECT id_local, absolutePath FROM AgLibraryRootFolder ORDER BY id_local'
+    )
+
+    index = RootFolderIndex(paths_by_id={}, ids_by_path={})
+    for root_id, absolute_path in cursor:
+        index.paths_by_id[root_id] = absolute_path or ''
+        if absolute_path is not None:
+            index.ids_by_path.setdefault(absolute_path, []).append(root_id)
+    return index
+
+
+def _set_root_folder_path(
+    root_index: RootFolderIndex,
+    root_id: int,
+    new_path: str,
+) -> None:
+    """Répercute dans l'index le nouveau chemin d'un root_folder.
+
+    Args:
+        root_index: Index des root_folders à mettre à jour.
+        root_id: ID du root_folder modifié.
+        new_path: Nouveau chemin du root_folder.
+
+    """
+    old_path = root_index.paths_by_id.get(root_id)
+    if old_path is not None and old_path in root_index.ids_by_path:
+        ids = root_index.ids_by_path[old_path]
+        if root_id in ids:
+            ids.remove(root_id)
+        if not ids:
+            del root_index.ids_by_path[old_path]
+    root_index.paths_by_id[root_id] = new_path
+    root_index.ids_by_path.setdefault(new_path, []).append(root_id)
 
 
 def _update_single_root_folder(
     cursor: sqlite3.Cursor,
+    root_index: RootFolderIndex,
     root_id: int,
     new_path: str,
     dry_run: bool,
@@ -487,6 +649,7 @@ def _update_single_root_folder(
 
     Args:
         cursor: Curseur de base de données.
+        root_index: Index en mémoire des root_folders du catalogue.
         root_id: ID du répertoire racine.
         new_path: Nouveau chemin.
         dry_run: Si True, ne fait que simuler.
@@ -495,14 +658,8 @@ def _update_single_root_folder(
         Tuple (updated, skipped, conflict, merged_count).
 
     """
-    cursor.execute(
-        'SELECT absolutePath FROM AgLibraryRootFolder WHERE id_local = ?',
-        (root_id,)
-    )
-    result = cursor.fetchone()
-    
-    if result:
-        current_path = result[0] or ''
+    if root_id in root_index.paths_by_id:
+        current_path = root_index.paths_by_id[root_id]
         # Normaliser les deux chemins pour la comparaison
         current_normalized = _normalize_path_for_comparison(current_path)
         new_normalized = _normalize_path_for_comparison(new_path)
@@ -511,11 +668,10 @@ def _update_single_root_folder(
             return (False, True, False, 0)
 
     # Vérifier si le nouveau chemin existe déjà pour un autre root_folder_id
-    cursor.execute(
-        'SELECT id_local FROM AgLibraryRootFolder WHERE absolutePath = ? AND id_local != ?',
-        (new_path, root_id)
-    )
-    existing = cursor.fetchone()
+    existing = [
+        other_id for other_id in root_index.ids_by_path.get(new_path, [])
+        if other_id != root_id
+    ]
     
     if existing:
         # Le chemin existe déjà pour un autre root_folder_id
@@ -532,23 +688,68 @@ def _update_single_root_folder(
             'UPDATE AgLibraryRootFolder SET absolutePath = ? WHERE id_local = ?',
             (new_path, root_id)
         )
+        _set_root_folder_path(root_index, root_id, new_path)
         return (True, False, False, 0)
     
     # Mode dry_run : on simule la mise à jour
     return (True, False, False, 0)
 
 
+def _load_files_by_root(
+    cursor: sqlite3.Cursor,
+    root_ids: List[int],
+) -> Dict[int, List[LightroomFile]]:
+    """Charge en une passe les fichiers de plusieurs root_folders.
+
+    Les IDs sont envoyés par paquets pour respecter la limite du nombre
+    de paramètres d'une requête SQLite.
+
+    Args:
+        cursor: Curseur de base de données.
+        root_ids: Liste des IDs de root_folders à charger.
+
+    Returns:
+        Dictionnaire root_id -> liste des fichiers Lightroom de ce root_folder.
+
+    """
+    files_by_root: Dict[int, List[LightroomFile]] = {
+        root_id: [] for root_id in root_ids
+    }
+
+    for start in range(0, len(root_ids), _SQLITE_MAX_VARIABLES):
+        chunk = root_ids[start:start + _SQLITE_MAX_VARIABLES]
+        placeholders = ', '.join('?' * len(chunk))
+        cursor.execute(f'''
+            SELECT
+                fl.id_local,
+                fl.baseName,
+                fl.extension,
+                fl.folder,
+                f.rootFolder,
+                rf.absolutePath,
+                f.pathFromRoot
+            FROM AgLibraryFile fl
+            JOIN AgLibraryFolder f ON fl.folder = f.id_local
+            JOIN AgLibraryRootFolder rf ON f.rootFolder = rf.id_local
+            WHERE rf.id_local IN ({placeholders})
+        ''', chunk)
+
+        for row in cursor:
+            lr_file = _lightroom_file_from_row(row)
+            files_by_root[lr_file.root_folder_id].append(lr_file)
+
+    return files_by_root
+
+
 def _find_matches_by_filename_only(
-    catalog_path: Path,
-    root_id: int,
+    lr_files: List[LightroomFile],
     photos_by_filename: Dict[str, List[PhotoScan]],
     photos_base_path: str
 ) -> List[MatchResult]:
     """Trouve des correspondances par nom de fichier uniquement pour un root_folder.
 
     Args:
-        catalog_path: Chemin vers le catalogue Lightroom.
-        root_id: ID du root_folder à traiter.
+        lr_files: Fichiers Lightroom du root_folder à traiter.
         photos_by_filename: Dictionnaire des photos indexées par nom.
         photos_base_path: Chemin de base des photos.
 
@@ -556,34 +757,12 @@ def _find_matches_by_filename_only(
         Liste des correspondances trouvées par nom uniquement.
 
     """
-    conn = sqlite3.connect(str(catalog_path))
-    cursor = conn.cursor()
-    
-    # Récupérer tous les fichiers de ce root_folder
-    cursor.execute('''
-        SELECT
-            fl.id_local,
-            fl.baseName,
-            fl.extension,
-            fl.folder,
-            f.rootFolder,
-            rf.absolutePath,
-            f.pathFromRoot
-        FROM AgLibraryFile fl
-        JOIN AgLibraryFolder f ON fl.folder = f.id_local
-        JOIN AgLibraryRootFolder rf ON f.rootFolder = rf.id_local
-        WHERE rf.id_local = ?
-    ''', (root_id,))
-    
-    rows = cursor.fetchall()
-    conn.close()
-    
     matches: List[MatchResult] = []
+    # Les fichiers d'un même dossier partagent le même nouveau chemin
+    new_paths_by_repertoire: Dict[str, str] = {}
     
-    for row in rows:
-        file_id, base_name, extension, folder_id, root_folder_id, old_path, path_from_root = row
-        
-        filename = f"{base_name}.{extension}"
+    for lr_file in lr_files:
+        filename = f"{lr_file.base_name}.{lr_file.extension}"
         if filename not in photos_by_filename:
             continue
         
@@ -595,17 +774,10 @@ def _find_matches_by_filename_only(
         # Utiliser le premier candidat trouvé
         photo = candidates[0]
         
-        lr_file = LightroomFile(
-            id_local=file_id,
-            base_name=base_name,
-            extension=extension,
-            folder_id=folder_id,
-            root_folder_id=root_folder_id,
-            old_absolute_path=old_path or '',
-            path_from_root=path_from_root or ''
-        )
-        
-        new_path = _build_new_path(photos_base_path, photo.repertoire)
+        new_path = new_paths_by_repertoire.get(photo.repertoire)
+        if new_path is None:
+            new_path = _build_new_path(photos_base_path, photo.repertoire)
+            new_paths_by_repertoire[photo.repertoire] = new_path
         
         match = MatchResult(
             lightroom_file=lr_file,
@@ -618,6 +790,23 @@ def _find_matches_by_filename_only(
     return matches
 
 
+def _escape_like(value: str) -> str:
+    """Échappe les jokers LIKE (%, _) d'une valeur pour SQLite.
+
+    Args:
+        value: Valeur à échapper.
+
+    Returns:
+        Valeur utilisable avec la clause ESCAPE de LIKE.
+
+    """
+    return (
+        value.replace('\\', '\\\\')
+        .replace('%', '\\%')
+        .replace('_', '\\_')
+    )
+
+
 def _count_root_folders_without_matches(
     cursor: sqlite3.Cursor,
     photos_base_path: str,
@@ -635,8 +824,8 @@ def _count_root_folders_without_matches(
     cursor.execute('''
         SELECT COUNT(DISTINCT rf.id_local)
         FROM AgLibraryRootFolder rf
-        WHERE rf.absolutePath NOT LIKE ? || '%'
-    ''', (photos_base_path,))
+        WHERE rf.absolutePath NOT LIKE ? ESCAPE '\\'
+    ''', (_escape_like(photos_base_path) + '%',))
     result = cursor.fetchone()
     return result[0] if result else 0
 
@@ -657,13 +846,19 @@ def _find_root_folders_without_matches(
         Liste des IDs de root_folders sans matches.
 
     """
+    # EXISTS s'arrête au premier fichier trouvé au lieu de joindre
+    # toutes les lignes de AgLibraryFile pour les dédoublonner ensuite
     cursor.execute('''
-        SELECT DISTINCT rf.id_local
+        SELECT rf.id_local
         FROM AgLibraryRootFolder rf
-        JOIN AgLibraryFolder f ON rf.id_local = f.rootFolder
-        JOIN AgLibraryFile fl ON f.id_local = fl.folder
-        WHERE rf.absolutePath NOT LIKE ? || '%'
-    ''', (photos_base_path,))
+        WHERE rf.absolutePath NOT LIKE ? ESCAPE '\\'
+          AND EXISTS (
+              SELECT 1
+              FROM AgLibraryFolder f
+              JOIN AgLibraryFile fl ON f.id_local = fl.folder
+              WHERE f.rootFolder = rf.id_local
+          )
+    ''', (_escape_like(photos_base_path) + '%',))
     
     root_folders_with_files = cursor.fetchall()
     root_ids_without_matches = [
@@ -702,8 +897,9 @@ def _find_most_common_path_from_matches(
 
 def _process_single_root_folder_by_filename(
     cursor: sqlite3.Cursor,
-    catalog_path: Path,
+    root_index: RootFolderIndex,
     root_id: int,
+    files_by_root: Dict[int, List[LightroomFile]],
     photos_by_filename: Dict[str, List[PhotoScan]],
     photos_base_path: str,
     min_matches: int,
@@ -713,8 +909,10 @@ def _process_single_root_folder_by_filename(
 
     Args:
         cursor: Curseur de base de données.
-        catalog_path: Chemin vers le catalogue Lightroom.
+        root_index: Index en mémoire des root_folders du catalogue.
         root_id: ID du root_folder à traiter.
+        files_by_root: Fichiers Lightroom des root_folders de la passe,
+            tenus à jour après une fusion.
         photos_by_filename: Dictionnaire des photos indexées par nom.
         photos_base_path: Chemin de base des photos.
         min_matches: Nombre minimum de matches requis.
@@ -724,9 +922,25 @@ def _process_single_root_folder_by_filename(
         Tuple (updated, skipped, conflict, merged_count).
 
     """
+    lr_files = files_by_root[root_id]
+    total_files = len(lr_files)
+    
+    # Sortie rapide : le nombre de fichiers présents dans le scan majore le
+    # nombre de matches ; si même ce majorant est refusé (cas courant : aucun
+    # fichier du root_folder dans le scan), inutile de construire les matches
+    candidate_count = sum(
+        1 for lr_file in lr_files
+        if f"{lr_file.base_name}.{lr_file.extension}" in photos_by_filename
+    )
+    if candidate_count == 0 or not _validate_root_folder_update(
+        total_files,
+        candidate_count,
+        min_matches
+    ):
+        return (False, False, False, 0)
+    
     filename_matches = _find_matches_by_filename_only(
-        catalog_path,
-        root_id,
+        lr_files,
         photos_by_filename,
         photos_base_path
     )
@@ -739,7 +953,6 @@ def _process_single_root_folder_by_filename(
         return (False, False, False, 0)
     
     most_common_path, filename_match_count = result
-    total_files = _count_total_files_in_root_folder(cursor, root_id)
     
     if not _validate_root_folder_update(
         total_files,
@@ -748,12 +961,20 @@ def _process_single_root_folder_by_filename(
     ):
         return (False, False, False, 0)
     
-    return _update_single_root_folder(
+    updated, skipped, conflict, merged_count = _update_single_root_folder(
         cursor,
+        root_index,
         root_id,
         most_common_path,
         dry_run
     )
+    if merged_count and not dry_run:
+        # Les fichiers fusionnés rejoignent un root_folder peut-être encore
+        # à traiter dans cette passe : ses fichiers sont relus
+        for target_id in root_index.ids_by_path.get(most_common_path, []):
+            if target_id != root_id and target_id in files_by_root:
+                files_by_root.update(_load_files_by_root(cursor, [target_id]))
+    return (updated, skipped, conflict, merged_count)
 
 
 def _update_stats_from_result(
@@ -787,7 +1008,7 @@ def _update_stats_from_result(
 
 def _process_root_folders_without_matches(
     cursor: sqlite3.Cursor,
-    catalog_path: Path,
+    root_index: RootFolderIndex,
     root_ids_without_matches: List[int],
     photos_by_filename: Optional[Dict[str, List[PhotoScan]]],
     photos_base_path: Optional[str],
@@ -798,7 +1019,7 @@ def _process_root_folders_without_matches(
 
     Args:
         cursor: Curseur de base de données.
-        catalog_path: Chemin vers le catalogue Lightroom.
+        root_index: Index en mémoire des root_folders du catalogue.
         root_ids_without_matches: Liste des IDs de root_folders sans matches.
         photos_by_filename: Dictionnaire des photos (optionnel).
         photos_base_path: Chemin de base des photos (optionnel).
@@ -821,11 +1042,14 @@ def _process_root_folders_without_matches(
     if not photos_by_filename or not photos_base_path:
         return stats
     
+    files_by_root = _load_files_by_root(cursor, root_ids_without_matches)
+    
     for root_id in root_ids_without_matches:
         result = _process_single_root_folder_by_filename(
             cursor,
-            catalog_path,
+            root_index,
             root_id,
+            files_by_root,
             photos_by_filename,
             photos_base_path,
             min_matches,
@@ -865,6 +1089,7 @@ def _validate_root_folder_update(
 
 def _process_root_folders_with_matches(
     cursor: sqlite3.Cursor,
+    root_index: RootFolderIndex,
     updates_by_root: Dict[int, str],
     match_counts: Dict[int, int],
     min_matches: int,
@@ -874,6 +1099,7 @@ def _process_root_folders_with_matches(
 
     Args:
         cursor: Curseur de base de données.
+        root_index: Index en mémoire des root_folders du catalogue.
         updates_by_root: Dictionnaire root_id -> nouveau chemin.
         match_counts: Dictionnaire root_id -> nombre de matches.
         min_matches: Nombre minimum de matches requis.
@@ -892,8 +1118,16 @@ def _process_root_folders_with_matches(
         'merged': 0
     }
     
+    # Un seul comptage groupé ; après une fusion réelle, les comptes des
+    # root_folders concernés changent et sont alors relus un par un
+    file_counts = _count_files_by_root(cursor, list(updates_by_root))
+    counts_are_current = True
+
     for root_id, new_path in updates_by_root.items():
-        total_files = _count_total_files_in_root_folder(cursor, root_id)
+        if counts_are_current:
+            total_files = file_counts[root_id]
+        else:
+            total_files = _count_total_files_in_root_folder(cursor, root_id)
         match_count = match_counts.get(root_id, 0)
         
         if not _validate_root_folder_update(total_files, match_count, min_matches):
@@ -903,6 +1137,7 @@ def _process_root_folders_with_matches(
         was_updated, was_skipped, has_conflict, merged_count = (
             _update_single_root_folder(
                 cursor,
+                root_index,
                 root_id,
                 new_path,
                 dry_run
@@ -912,6 +1147,8 @@ def _process_root_folders_with_matches(
         if was_updated:
             stats['updated'] += 1
             stats['merged'] += merged_count
+            if merged_count and not dry_run:
+                counts_are_current = False
         elif was_skipped:
             stats['skipped'] += 1
         elif has_conflict:
@@ -968,6 +1205,10 @@ def update_root_folders(
     """
     conn = sqlite3.connect(str(catalog_path))
     cursor = conn.cursor()
+    # Le mode de journal du catalogue n'est pas modifié (il serait conservé
+    # dans le fichier) : seuls les caches de cette connexion sont agrandis
+    for pragma in _CACHE_PRAGMAS:
+        cursor.execute(f'PRAGMA {pragma}')
     
     photos_base_path_normalized = _load_photos_directory().replace('\\', '/')
     
@@ -995,9 +1236,11 @@ def update_root_folders(
         photos_base_path_normalized
     )
     
+    root_index = _load_root_folder_index(cursor)
+    
     stats_no_matches = _process_root_folders_without_matches(
         cursor,
-        catalog_path,
+        root_index,
         root_ids_without_matches,
         photos_by_filename,
         photos_base_path or photos_base_path_normalized,
@@ -1007,6 +1250,7 @@ def update_root_folders(
     
     stats_with_matches = _process_root_folders_with_matches(
         cursor,
+        root_index,
         updates_by_root,
         match_counts,
         min_matches,
@@ -1022,6 +1266,18 @@ def update_root_folders(
     return stats
 
 
+# Passe à True après la lecture du fichier .env
+_DOTENV_LOADED = False
+
+
+def _ensure_dotenv_loaded() -> None:
+    """Charge le fichier .env une seule fois par processus."""
+    global _DOTENV_LOADED
+    if not _DOTENV_LOADED:
+        load_dotenv()
+        _DOTENV_LOADED = True
+
+
 def _load_dry_run_mode() -> bool:
     """Charge le mode dry_run depuis le fichier .env.
 
@@ -1030,7 +1286,7 @@ def _load_dry_run_mode() -> bool:
         Par défaut retourne True (mode simulation).
 
     """
-    load_dotenv()
+    _ensure_dotenv_loaded()
     dry_run_str = os.getenv('DRY_RUN_MODE', 'true').lower()
     return dry_run_str in ('true', '1', 'yes', 'on')
 
@@ -1042,7 +1298,7 @@ def _load_photos_directory() -> str:
         Chemin du répertoire de base des photos.
 
     """
-    load_dotenv()
+    _ensure_dotenv_loaded()
     return os.getenv('PHOTOS_DIRECTORY', r'\\hal9001\Volume_1\photos')
 
 
@@ -1053,7 +1309,7 @@ def _load_scan_db_filename() -> str:
         Nom du fichier de base de données du scan.
 
     """
-    load_dotenv()
+    _ensure_dotenv_loaded()
     return os.getenv('SCAN_DB_FILENAME', 'photos_scan_20251107_192045.db')
 
 
@@ -1064,7 +1320,7 @@ def _load_catalog_filename() -> str:
         Nom du fichier catalogue Lightroom.
 
     """
-    load_dotenv()
+    _ensure_dotenv_loaded()
     return os.getenv('CATALOG_FILENAME', 'catalogue 2 - dès juin 2017-2-2-v12.lrcat')
 
 